@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import EolVimeoVideo
+from .models import EolVimeoVideo, EolVimeoSyncState
 
 class EolVimeoVideoAdmin(admin.ModelAdmin):
     raw_id_fields = ('user',)
     list_display = ('course_key', 'user', 'edx_video_id', 'vimeo_video_id', 'status')
-    search_fields = ['course_key', 'user__username', 'edx_video_id', 'vimeo_video_id', 'status']
+    search_fields = ['course_key', 'user__username', '=edx_video_id', '=vimeo_video_id', 'status']
     ordering = ['-course_key']
 
-admin.site.register(EolVimeoVideo, EolVimeoVideoAdmin)
\ No newline at end of file
+admin.site.register(EolVimeoVideo, EolVimeoVideoAdmin)
+
+class EolVimeoSyncStateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'high_water_mark', 'updated_at')
+
+admin.site.register(EolVimeoSyncState, EolVimeoSyncStateAdmin)
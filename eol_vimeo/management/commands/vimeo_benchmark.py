@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from eol_vimeo.vimeo_benchmark import run_benchmarks
+from eol_vimeo.vimeo_utils import VIMEO_BATCH_SIZE
+
+import json
+
+import logging
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Benchmark the Vimeo poller, the status classifier and the upload against a local fake Vimeo API, the seeded data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--videos', type=int, default=1000, help='Number of seeded videos.')
+        parser.add_argument('--latency', type=float, default=0, help='Seconds added by the fake Vimeo API to each response.')
+        parser.add_argument('--rate-limit', type=int, default=None, help='Requests allowed by the fake Vimeo API per --rate-window seconds.')
+        parser.add_argument('--rate-window', type=int, default=60, help='Seconds of the rate limit window.')
+        parser.add_argument('--files', type=int, default=6, help='Number of entries of the files array of the videos (max 10).')
+        parser.add_argument('--padding', type=int, default=0, help='Extra bytes in each file link, to simulate bigger payloads.')
+        parser.add_argument('--workers', type=int, default=1, help='--workers of the poller.')
+        parser.add_argument('--batch-size', type=int, default=None, help='--batch-size of the poller.')
+        parser.add_argument('--bulk-size', type=int, default=None, help='--bulk-size of the poller.')
+        parser.add_argument('--repeat', type=int, default=1, help='Number of runs of the suite.')
+        parser.add_argument('--no-upload', action='store_true', help='Skip the upload_vimeo benchmark.')
+        parser.add_argument('--json', action='store_true', help='Print the results as json lines.')
+
+    def handle(self, *args, **options):
+        """
+            Run the benchmark suite and print wall time, API calls, DB queries and peak memory
+        """
+        if options['videos'] < 1 or options['workers'] < 1 or options['repeat'] < 1:
+            raise CommandError('--videos, --workers and --repeat must be greater than 0')
+        if options['batch_size'] is not None and not 0 < options['batch_size'] <= VIMEO_BATCH_SIZE:
+            raise CommandError('--batch-size must be between 1 and {}'.format(VIMEO_BATCH_SIZE))
+        for run in range(options['repeat']):
+            logger.info('EolVimeoCommand - Running benchmark {} of {}'.format(run + 1, options['repeat']))
+            results = run_benchmarks(
+                videos=options['videos'],
+                latency=options['latency'],
+                rate_limit=options['rate_limit'],
+                rate_window=options['rate_window'],
+                files=options['files'],
+                padding=options['padding'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                bulk_size=options['bulk_size'],
+                upload=not options['no_upload']
+            )
+            for result in results:
+                result['run'] = run + 1
+                if options['json']:
+                    self.stdout.write(json.dumps(result))
+                else:
+                    self.stdout.write(
+                        '{run} {name}: videos={videos} wall_time={wall_time:.3f}s api_calls={api_calls} '
+                        'throttled={throttled} db_queries={db_queries} peak_memory={peak_memory_kb:.0f}KiB'.format(
+                            peak_memory_kb=result['peak_memory'] / 1024, **result))
@@ -1,22 +1,193 @@
 from django.core.management.base import BaseCommand, CommandError
 
+from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 from django.contrib.auth.models import User
 from django.conf import settings
-from eol_vimeo.vimeo_utils import update_video_vimeo
+from eol_vimeo import vimeo_async
+from eol_vimeo.vimeo_metrics import Timings, collect, profile
+from eol_vimeo.models import PENDING_STATUS
+from eol_vimeo.vimeo_utils import sync_video_vimeo, update_video_vimeo, VIMEO_BATCH_SIZE
 
+import argparse
 import datetime
+import re
 from django.utils import timezone
 
 import logging
 logger = logging.getLogger(__name__)
 
+AGE_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+def parse_age(value):
+    """
+        Parse an age like 90, 90s, 30m, 12h or 7d to a timedelta
+    """
+    match = re.match(r'^(\d+)([smhd]?)$', value)
+    if match is None:
+        raise argparse.ArgumentTypeError('invalid age "{}", use a number followed by s, m, h or d'.format(value))
+    return datetime.timedelta(**{AGE_UNITS[match.group(2) or 's']: int(match.group(1))})
+
+def parse_shard(value):
+    """
+        Parse a shard i/N to (i, N), with 0 <= i < N
+    """
+    match = re.match(r'^(\d+)/(\d+)$', value)
+    if match is None or not int(match.group(1)) < int(match.group(2)):
+        raise argparse.ArgumentTypeError('invalid shard "{}", use i/N with 0 <= i < N'.format(value))
+    return (int(match.group(1)), int(match.group(2)))
+
+# options of the regular run that --sync does not use: dest -> (flag, default)
+SYNC_IGNORED_OPTIONS = {
+    'workers': ('--workers', 1),
+    'batch_size': ('--batch-size', None),
+    'ignore_schedule': ('--ignore-schedule', False),
+    'course': ('--course', None),
+    'status': ('--status', None),
+    'shard': ('--shard', None),
+    'limit': ('--limit', None),
+    'older_than': ('--older-than', None),
+    'newer_than': ('--newer-than', None),
+    'use_async': ('--async', False),
+    'concurrency': ('--concurrency', None),
+}
+
 class Command(BaseCommand):
     help = 'This command will Update path video from video with status "vimeo_encoding, vimeo_upload".'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of threads used to get the video data from Vimeo (1 = sequential).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Get the data of up to this many videos (max 100) per request to Vimeo.'
+        )
+        parser.add_argument(
+            '--bulk-size',
+            type=int,
+            default=None,
+            help='Number of updated videos written per transaction (default EOL_VIMEO_BULK_UPDATE_SIZE, 1 = one save per video).'
+        )
+        parser.add_argument(
+            '--ignore-schedule',
+            action='store_true',
+            help='Check all the pending videos, not only the ones whose next check time has passed.'
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Only update the pending videos modified in Vimeo since the last sync (pages of /me/videos by modified_time) and the due videos uploaded more than 2 hrs ago.'
+        )
+        parser.add_argument(
+            '--course',
+            default=None,
+            help='Only check the videos of this course id.'
+        )
+        parser.add_argument(
+            '--status',
+            action='append',
+            choices=PENDING_STATUS,
+            default=None,
+            help='Only check the videos with this status (can be repeated).'
+        )
+        parser.add_argument(
+            '--shard',
+            type=parse_shard,
+            default=None,
+            help='i/N, only check the videos with id %% N == i, so N runners split the videos with no overlap.'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Check at most this many videos, the most overdue first.'
+        )
+        parser.add_argument(
+            '--older-than',
+            type=parse_age,
+            default=None,
+            help='Only check the videos uploaded more than this age ago (e.g. 90s, 30m, 12h, 7d).'
+        )
+        parser.add_argument(
+            '--newer-than',
+            type=parse_age,
+            default=None,
+            help='Only check the videos uploaded less than this age ago (e.g. 90s, 30m, 12h, 7d).'
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='use_async',
+            help='Get the video data with the asyncio client on one thread (requires httpx, HTTP/2 with h2).'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Requests in flight with --async (default EOL_VIMEO_ASYNC_CONCURRENCY).'
+        )
+        parser.add_argument(
+            '--profile',
+            default=None,
+            help='Write a cProfile dump (pstats) of the run to this path.'
+        )
+        parser.add_argument(
+            '--timings',
+            action='store_true',
+            help='Print the count, total, p50, p95 and max time of each phase and Vimeo endpoint.'
+        )
+
     def handle(self, *args, **options):
         """
             Update path video from video with status 'vimeo_encoding'
         """
-        logger.info('EolVimeoCommand - Running vimeo_utils.update_video_vimeo()')
-        update_video_vimeo()
+        if options['workers'] < 1:
+            raise CommandError('--workers must be greater than 0')
+        if options['batch_size'] is not None and not 0 < options['batch_size'] <= VIMEO_BATCH_SIZE:
+            raise CommandError('--batch-size must be between 1 and {}'.format(VIMEO_BATCH_SIZE))
+        if options['bulk_size'] is not None and options['bulk_size'] < 1:
+            raise CommandError('--bulk-size must be greater than 0')
+        if options['sync']:
+            ignored = [flag for key, (flag, default) in SYNC_IGNORED_OPTIONS.items() if options[key] != default]
+            if ignored:
+                raise CommandError('--sync can not be used with {}'.format(', '.join(ignored)))
+        if options['limit'] is not None and options['limit'] < 1:
+            raise CommandError('--limit must be greater than 0')
+        if options['course'] is not None:
+            try:
+                CourseKey.from_string(options['course'])
+            except InvalidKeyError:
+                raise CommandError('--course {} is not a valid course id'.format(options['course']))
+        filters = {x: options[x] for x in ['status', 'shard', 'limit', 'older_than', 'newer_than'] if options[x] is not None}
+        if options['course'] is not None:
+            filters['course_id'] = options['course']
+        concurrency = None
+        if options['use_async']:
+            if not vimeo_async.is_available():
+                raise CommandError('--async requires httpx (pip install httpx[http2])')
+            concurrency = settings.EOL_VIMEO_ASYNC_CONCURRENCY if options['concurrency'] is None else options['concurrency']
+            if concurrency < 1:
+                raise CommandError('--concurrency must be greater than 0')
+        timings = Timings() if options['timings'] else None
+        with collect(timings), profile(options['profile']):
+            if options['sync']:
+                logger.info('EolVimeoCommand - Running vimeo_utils.sync_video_vimeo()')
+                sync_video_vimeo(bulk_size=options['bulk_size'])
+            else:
+                logger.info('EolVimeoCommand - Running vimeo_utils.update_video_vimeo()')
+                update_video_vimeo(
+                    workers=options['workers'],
+                    batch_size=options['batch_size'],
+                    bulk_size=options['bulk_size'],
+                    due_only=not options['ignore_schedule'],
+                    concurrency=concurrency,
+                    **filters
+                )
+        if timings is not None:
+            self.stdout.write(timings.format())
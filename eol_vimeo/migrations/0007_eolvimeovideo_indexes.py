@@ -0,0 +1,31 @@
+# Generated by Django 2.2.24 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_vimeo', '0006_eolvimeovideo_url_picture'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eolvimeovideo',
+            index=models.Index(fields=['status', 'course_key'], name='eolvimeo_status_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eolvimeovideo',
+            index=models.Index(fields=['edx_video_id', 'token'], name='eolvimeo_video_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eolvimeovideo',
+            index=models.Index(fields=['vimeo_video_id'], name='eolvimeo_vimeo_id_idx'),
+        ),
+        # partial index, it only helps on PostgreSQL (and SQLite), MySQL does not
+        # support partial indexes and skips it, there the poller uses eolvimeo_status_course_idx
+        migrations.AddIndex(
+            model_name='eolvimeovideo',
+            index=models.Index(condition=models.Q(status__in=['vimeo_encoding', 'vimeo_upload', 'upload_completed_encoding']), fields=['status'], name='eolvimeo_pending_idx'),
+        ),
+    ]
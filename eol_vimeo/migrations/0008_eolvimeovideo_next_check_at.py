@@ -0,0 +1,27 @@
+# Generated by Django 2.2.24 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_vimeo', '0007_eolvimeovideo_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eolvimeovideo',
+            name='check_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eolvimeovideo',
+            name='next_check_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='eolvimeovideo',
+            index=models.Index(fields=['status', 'next_check_at'], name='eolvimeo_status_check_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.24 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_vimeo', '0008_eolvimeovideo_next_check_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eolvimeovideo',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='eolvimeovideo',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='eolvimeovideo',
+            index=models.Index(fields=['lease_owner'], name='eolvimeo_lease_owner_idx'),
+        ),
+    ]
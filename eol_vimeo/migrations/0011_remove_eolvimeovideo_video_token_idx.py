@@ -0,0 +1,17 @@
+# Generated by Django 2.2.24 on 2026-10-18 15:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_vimeo', '0010_eolvimeosyncstate'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='eolvimeovideo',
+            name='eolvimeo_video_token_idx',
+        ),
+    ]
@@ -5,6 +5,7 @@ from opaque_keys.edx.django.models import CourseKeyField
 
 # Create your models here.
 URL_REGEX = '^[a-zA-Z0-9\\-_]*$'
+PENDING_STATUS = ['vimeo_encoding', 'vimeo_upload', 'upload_completed_encoding']
 
 class EolVimeoVideo(models.Model):
     class Meta:
@@ -14,6 +15,14 @@ class EolVimeoVideo(models.Model):
         unique_together = [
             ["edx_video_id", "course_key"],
         ]
+        indexes = [
+            models.Index(fields=['status', 'course_key'], name='eolvimeo_status_course_idx'),
+            models.Index(fields=['vimeo_video_id'], name='eolvimeo_vimeo_id_idx'),
+            models.Index(fields=['status', 'next_check_at'], name='eolvimeo_status_check_idx'),
+            models.Index(fields=['lease_owner'], name='eolvimeo_lease_owner_idx'),
+            # partial index, only created on PostgreSQL and SQLite (MySQL skips it)
+            models.Index(fields=['status'], name='eolvimeo_pending_idx', condition=models.Q(status__in=PENDING_STATUS)),
+        ]
     edx_video_id = models.CharField(
         max_length=100,
         validators=[
@@ -32,4 +41,16 @@ class EolVimeoVideo(models.Model):
     status = models.CharField(max_length=50, blank=True)
     error_description = models.TextField('Error Description', blank=True, null=True)
     token = models.CharField(max_length=50, default='', blank=True)
-    expiry_at = models.DateTimeField(null=True, default=None, blank=True)
\ No newline at end of file
+    expiry_at = models.DateTimeField(null=True, default=None, blank=True)
+    next_check_at = models.DateTimeField(null=True, default=None, blank=True)
+    check_attempts = models.PositiveIntegerField(default=0)
+    lease_owner = models.CharField(max_length=100, default='', blank=True)
+    lease_expires_at = models.DateTimeField(null=True, default=None, blank=True)
+
+class EolVimeoSyncState(models.Model):
+    """
+        High-water mark of the incremental sync (modified_time of the last Vimeo video seen)
+    """
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, default=None, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -3,4 +3,29 @@ def plugin_settings(settings):
     settings.EOL_VIMEO_CLIENT_SECRET = settings.ENV_TOKENS.get('EOL_VIMEO_CLIENT_ID', '')
     settings.EOL_VIMEO_CLIENT_TOKEN = settings.ENV_TOKENS.get('EOL_VIMEO_CLIENT_ID', '')
     settings.EOL_VIMEO_MAIN_FOLDER = settings.ENV_TOKENS.get('EOL_VIMEO_CLIENT_ID', None)
-    settings.EOL_VIMEO_DOMAINS = settings.ENV_TOKENS.get('EOL_VIMEO_CLIENT_ID', [])
\ No newline at end of file
+    settings.EOL_VIMEO_DOMAINS = settings.ENV_TOKENS.get('EOL_VIMEO_CLIENT_ID', [])
+    settings.EOL_VIMEO_HTTP_POOL_SIZE = settings.ENV_TOKENS.get('EOL_VIMEO_HTTP_POOL_SIZE', 10)
+    settings.EOL_VIMEO_HTTP_TIMEOUT = settings.ENV_TOKENS.get('EOL_VIMEO_HTTP_TIMEOUT', (3.05, 30))
+    settings.EOL_VIMEO_HTTP_KEEP_ALIVE = settings.ENV_TOKENS.get('EOL_VIMEO_HTTP_KEEP_ALIVE', True)
+    settings.EOL_VIMEO_HTTP_MAX_RETRIES = settings.ENV_TOKENS.get('EOL_VIMEO_HTTP_MAX_RETRIES', 0)
+    settings.EOL_VIMEO_BULK_UPDATE_SIZE = settings.ENV_TOKENS.get('EOL_VIMEO_BULK_UPDATE_SIZE', 100)
+    settings.EOL_VIMEO_UPLOAD_CONCURRENCY = settings.ENV_TOKENS.get('EOL_VIMEO_UPLOAD_CONCURRENCY', 0)
+    settings.EOL_VIMEO_RATE_LIMIT_RETRIES = settings.ENV_TOKENS.get('EOL_VIMEO_RATE_LIMIT_RETRIES', 3)
+    settings.EOL_VIMEO_RATE_LIMIT_MAX_WAIT = settings.ENV_TOKENS.get('EOL_VIMEO_RATE_LIMIT_MAX_WAIT', 60)
+    settings.EOL_VIMEO_WEBHOOK_SECRET = settings.ENV_TOKENS.get('EOL_VIMEO_WEBHOOK_SECRET', '')
+    settings.EOL_VIMEO_POLL_BACKOFF = settings.ENV_TOKENS.get('EOL_VIMEO_POLL_BACKOFF', {'vimeo_upload': 60, 'vimeo_encoding': 120, 'upload_completed_encoding': 1800})
+    settings.EOL_VIMEO_POLL_MAX_INTERVAL = settings.ENV_TOKENS.get('EOL_VIMEO_POLL_MAX_INTERVAL', 3600)
+    settings.EOL_VIMEO_PERMISSION_CACHE_TIMEOUT = settings.ENV_TOKENS.get('EOL_VIMEO_PERMISSION_CACHE_TIMEOUT', 60)
+    settings.EOL_VIMEO_API_URL = settings.ENV_TOKENS.get('EOL_VIMEO_API_URL', 'https://api.vimeo.com')
+    settings.EOL_VIMEO_METRICS_ENABLED = settings.ENV_TOKENS.get('EOL_VIMEO_METRICS_ENABLED', False)
+    settings.EOL_VIMEO_METRICS_SINKS = settings.ENV_TOKENS.get('EOL_VIMEO_METRICS_SINKS', ['eol_vimeo.vimeo_metrics.PrometheusRegistry'])
+    settings.EOL_VIMEO_METRICS_TOKEN = settings.ENV_TOKENS.get('EOL_VIMEO_METRICS_TOKEN', '')
+    settings.EOL_VIMEO_UPLOAD_TIMINGS = settings.ENV_TOKENS.get('EOL_VIMEO_UPLOAD_TIMINGS', False)
+    settings.EOL_VIMEO_UPLOAD_PROFILE_DIR = settings.ENV_TOKENS.get('EOL_VIMEO_UPLOAD_PROFILE_DIR', '')
+    settings.EOL_VIMEO_DOMAINS_SKIP_EXISTING = settings.ENV_TOKENS.get('EOL_VIMEO_DOMAINS_SKIP_EXISTING', False)
+    settings.EOL_VIMEO_FOLDER_CACHE_TIMEOUT = settings.ENV_TOKENS.get('EOL_VIMEO_FOLDER_CACHE_TIMEOUT', 86400)
+    settings.EOL_VIMEO_ASYNC_CONCURRENCY = settings.ENV_TOKENS.get('EOL_VIMEO_ASYNC_CONCURRENCY', 100)
+    settings.EOL_VIMEO_POLL_LEASE_SECONDS = settings.ENV_TOKENS.get('EOL_VIMEO_POLL_LEASE_SECONDS', 900)
+    settings.EOL_VIMEO_SYNC_MAX_PAGES = settings.ENV_TOKENS.get('EOL_VIMEO_SYNC_MAX_PAGES', 50)
+    settings.EOL_VIMEO_VIDEO_CACHE_SIZE = settings.ENV_TOKENS.get('EOL_VIMEO_VIDEO_CACHE_SIZE', 1000)
+    settings.EOL_VIMEO_VIDEO_CACHE_TIMEOUT = settings.ENV_TOKENS.get('EOL_VIMEO_VIDEO_CACHE_TIMEOUT', 0)
\ No newline at end of file
@@ -3,14 +3,21 @@
 from __future__ import unicode_literals
 from collections import namedtuple
 from io import StringIO
+import asyncio
 import datetime
 import json
+import os
+import pstats
+import tempfile
+import threading
 import urllib.parse
 
 # Installed packages (via pip)
 from django.conf import settings
+from django.core.cache import cache
 from django.core.management import call_command
-from django.test import Client, TestCase
+from django.core.management.base import CommandError
+from django.test import Client, RequestFactory, TestCase
 from django.test.utils import override_settings
 from django.urls import reverse
 from mock import patch, Mock, MagicMock
@@ -29,8 +36,8 @@ from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
 # Internal project dependencies
-from . import vimeo_utils, vimeo_task, views
-from .models import EolVimeoVideo
+from . import vimeo_utils, vimeo_task, views, vimeo_client, vimeo_metrics, vimeo_async, vimeo_benchmark
+from .models import EolVimeoVideo, EolVimeoSyncState
 from .settings.production import plugin_settings
 
 class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
@@ -76,9 +83,9 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
                 email='student3@edx.org',
                 is_staff=True)
 
-    @patch('requests.put')
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('requests.Session.put')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -112,9 +119,9 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         data2 = [{'edxVideoId': self.video['edx_video_id'], 'status':'vimeo_upload', 'message': '', 'vimeo_id':'123456789'}]
         self.assertEqual(response, data2)
 
-    @patch('requests.put')
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('requests.Session.put')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -164,9 +171,9 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
                 {'edxVideoId': '789', 'status':'upload_cancelled', 'message': ''}]
         self.assertEqual(response, data2)
 
-    @patch('requests.put')
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('requests.Session.put')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -198,9 +205,9 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         data2 = [{'edxVideoId': self.video['edx_video_id'], 'status':'vimeo_upload', 'message': '', 'vimeo_id':'123456789'}]
         self.assertEqual(response, data2)
 
-    @patch('requests.put')
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('requests.Session.put')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -234,9 +241,9 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         data2 = [{'edxVideoId': self.video['edx_video_id'], 'status':'upload_failed', 'message': 'Video no se subió correctamente a Vimeo.', 'vimeo_id':'123456789'}]
         self.assertEqual(response, data2)
 
-    @patch('requests.put')
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('requests.Session.put')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -270,9 +277,9 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         data2 = [{'edxVideoId': self.video['edx_video_id'], 'status':'vimeo_upload', 'message': 'No se pudo mover el video a la carpeta principal en Vimeo. ', 'vimeo_id':'123456789'}]
         self.assertEqual(response, data2)
 
-    @patch('requests.put')
-    @patch('requests.post')
-    @patch('requests.get')
+    @patch('requests.Session.put')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -306,7 +313,34 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         data2 = [{'edxVideoId': self.video['edx_video_id'], 'status':'vimeo_upload', 'message': 'No se pudo agregar los dominios al video en Vimeo. ', 'vimeo_id':'123456789'}]
         self.assertEqual(response, data2)
 
-    @patch('requests.post')
+    @patch('requests.Session.put')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    @patch("eol_vimeo.vimeo_utils.get_storage")
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_DOMAINS=['test.cl'])
+    @override_settings(EOL_VIMEO_MAIN_FOLDER='12345')
+    @override_settings(EOL_VIMEO_RATE_LIMIT_RETRIES=0)
+    @override_settings(EOL_VIMEO_RATE_LIMIT_MAX_WAIT=0)
+    def test_upload_video_to_vimeo_add_domain_rate_limit(self, get_storage, get, post, put):
+        """
+            Test upload video to vimeo when the domain request is rate limited, the vimeo id is still returned
+        """
+        get_storage.configure_mock(open=Mock(), delete=Mock())
+        get_data2 = {'name':self.video['client_video_id'], 'status':'available', 'transcode': {'status': 'in_progress'}, 'duration':self.video['duration'], 'upload': {'status': 'in_progress'}, 'files': []}
+        post_data = {'upload': {'status': 'in_progress'}, 'uri': '/videos/123456789'}
+        put.side_effect = [namedtuple("Request", ["status_code", "json", "headers"])(429, lambda:{'error': 'Too many API requests'}, {}),namedtuple("Request", ["status_code"])(204),]
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data2),]
+        post.side_effect = [namedtuple("Request", ["status_code", "text"])(201, json.dumps(post_data)),]
+
+        data = [{'edxVideoId': self.video['edx_video_id'], 'status':'upload_completed', 'message': ''}]
+        response = vimeo_task.upload_vimeo(data, settings.EOL_VIMEO_MAIN_FOLDER, 'https://test.test.ts', self.course.id)
+        data2 = [{'edxVideoId': self.video['edx_video_id'], 'status':'vimeo_upload', 'message': 'No se pudo agregar los dominios al video en Vimeo. ', 'vimeo_id':'123456789'}]
+        self.assertEqual(response, data2)
+
+    @patch('requests.Session.post')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -331,7 +365,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         data2 = [{'edxVideoId': self.video['edx_video_id'], 'status':'upload_failed', 'message': 'No se pudo subir el video a Vimeo. ', 'vimeo_id':''}]
         self.assertEqual(response, data2)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -608,7 +642,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(len(EolVimeoVideo.objects.all()), 4)
         self.assertEqual(len(EolVimeoVideo.objects.filter(course_key=self.course2.id)), 2)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -679,7 +713,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo2.status, 'vimeo_upload')
         self.assertEqual(eolvimeo2.url_vimeo, '')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -720,7 +754,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo2.status, 'upload_completed')
         self.assertEqual(eolvimeo2.url_vimeo, get_data2['files'][0]['link'])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -745,7 +779,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(video['status'], 'vimeo_not_found')
         self.assertEqual(eolvimeo.status, 'vimeo_not_found')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -770,7 +804,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(video['status'], 'upload_failed')
         self.assertEqual(eolvimeo.status, 'upload_failed')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -796,7 +830,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'upload_failed')
         self.assertEqual(eolvimeo.error_description, 'Video no se subió correctamente a Vimeo.')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -822,7 +856,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'upload_failed')
         self.assertEqual(eolvimeo.error_description, 'Video no fue procesado correctamente en Vimeo. ')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -848,7 +882,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'vimeo_encoding')
         self.assertEqual(eolvimeo.error_description, 'Vimeo todavía está procesando el video.')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -874,7 +908,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'vimeo_upload')
         self.assertEqual(eolvimeo.error_description, 'No se pudo obtener los links del video en Vimeo. ')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -902,7 +936,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'vimeo_encoding')
         self.assertEqual(eolvimeo.error_description, 'Vimeo todavía está procesando el video.')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -930,7 +964,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'vimeo_upload')
         self.assertEqual(eolvimeo.error_description, 'Vimeo todavía está subiendo el video.')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -959,7 +993,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'upload_completed')
         self.assertEqual(eolvimeo.error_description, 'upload_completed, Lleva mas de 24 hrs procesando o video no tiene formato HD')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -988,7 +1022,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'upload_failed')
         self.assertEqual(eolvimeo.error_description, 'upload_failed, Lleva mas de 24 hrs procesando o video no tiene formato HD')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -1017,7 +1051,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'upload_completed_encoding')
         self.assertEqual(eolvimeo.error_description, 'upload_completed_encoding, Lleva más de 2 hrs procesando.')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_storage")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -1046,7 +1080,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'vimeo_encoding')
         self.assertEqual(eolvimeo.error_description, 'Vimeo todavía puede estar procesando el video.')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.update_video")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -1074,7 +1108,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(video['status'], 'vimeo_patch_failed')
         self.assertEqual(eolvimeo.status, 'vimeo_patch_failed')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.update_video")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
@@ -1106,7 +1140,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(video['status'], 'upload_failed')
         self.assertEqual(eolvimeo.status, 'upload_failed')
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_link_video")
     @patch("eol_vimeo.vimeo_utils.update_video")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
@@ -1138,7 +1172,7 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'vimeo_encoding')
         self.assertEqual(eolvimeo.error_description, 'Vimeo todavía puede estar procesando el video.')
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch("eol_vimeo.vimeo_utils.get_link_video")
     @patch("eol_vimeo.vimeo_utils.update_video")
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
@@ -1170,6 +1204,807 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(eolvimeo.status, 'vimeo_encoding')
         self.assertEqual(eolvimeo.error_description, 'vimeo_encoding, Lleva más de 2 hrs procesando.')
 
+    @patch('requests.Session.get')
+    @patch("eol_vimeo.vimeo_utils.get_storage")
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_update_video_vimeo_workers(self, get_storage, get):
+        """
+            Test update_video_vimeo fetching the videos in a thread pool
+        """
+        EolVimeoVideo.objects.create(
+            edx_video_id = self.video["edx_video_id"],
+            user =self.user,
+            vimeo_video_id = '1122334455',
+            course_key = self.course.id,
+            url_vimeo = '',
+            status = 'vimeo_encoding',
+            error_description = '',
+            expiry_at=datetime.datetime.utcnow()
+        )
+        EolVimeoVideo.objects.create(
+            edx_video_id = self.video2["edx_video_id"],
+            user =self.user,
+            vimeo_video_id = '9922334455',
+            course_key = self.course.id,
+            url_vimeo = '',
+            status = 'vimeo_upload',
+            error_description = '',
+            expiry_at=datetime.datetime.utcnow()
+        )
+        get_storage.configure_mock(open=Mock(), delete=Mock())
+        get_data = {'name':self.video['client_video_id'], 'status':'available', 'transcode': {'status': 'complete'}, 'duration':self.video['duration'], 'upload': {'status': 'complete'}, 'files': [{'quality': 'hd', 'type': 'source', 'width': 0, 'height': 0, 'link': 'https://player.vimeo.com/external/1122233344', 'created_time': '2021-06-08T14:21:04+00:00', 'fps': 30, 'size': 0, 'md5': None, 'public_name': 'HD 720p', 'size_short': ''}]}
+        get_data2 = {'name':self.video2['client_video_id'], 'status':'available', 'transcode': {'status': 'in_progress'}, 'duration':self.video2['duration'], 'upload': {'status': 'complete'}, 'files': [{'quality': 'hd', 'type': 'source', 'width': 0, 'height': 0, 'link': 'https://player.vimeo.com/external/9922233344', 'created_time': '2021-06-08T14:21:04+00:00', 'fps': 30, 'size': 0, 'md5': None, 'public_name': 'HD 720p', 'size_short': ''}]}
+        responses = {
+            'https://api.vimeo.com/videos/1122334455': get_data,
+            'https://api.vimeo.com/videos/9922334455': get_data2,
+        }
+        get.side_effect = lambda url, **kwargs: namedtuple("Request", ["status_code", "json"])(200, lambda:responses[url])
+        vimeo_utils.update_video_vimeo(str(self.course.id), workers=4)
+        eolvimeo1 = EolVimeoVideo.objects.get(edx_video_id=self.video["edx_video_id"])
+        eolvimeo2 = EolVimeoVideo.objects.get(edx_video_id=self.video2["edx_video_id"])
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(eolvimeo1.status, 'upload_completed')
+        self.assertEqual(eolvimeo1.url_vimeo, get_data['files'][0]['link'])
+        self.assertEqual(eolvimeo2.status, 'vimeo_encoding')
+        self.assertEqual(eolvimeo2.error_description, 'Vimeo todavía está procesando el video.')
+
+    def test_fetch_videos_vimeo_keep_order(self):
+        """
+            Test fetch_videos_vimeo return the data in the same order of the videos
+        """
+        videos = [SimpleNamespace(vimeo_video_id=str(x)) for x in range(25)]
+        with patch('eol_vimeo.vimeo_utils.get_video_vimeo', side_effect=lambda id_video: {'id': id_video}):
+            result = list(vimeo_utils.fetch_videos_vimeo(videos, workers=3))
+        self.assertEqual([x[0] for x in result], videos)
+        self.assertEqual([x[1]['id'] for x in result], [str(x) for x in range(25)])
+
+    @patch('requests.Session.get')
+    @patch("eol_vimeo.vimeo_utils.get_storage")
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_update_video_vimeo_batch(self, get_storage, get):
+        """
+            Test update_video_vimeo getting the videos data in one request
+        """
+        EolVimeoVideo.objects.create(
+            edx_video_id = self.video["edx_video_id"],
+            user =self.user,
+            vimeo_video_id = '1122334455',
+            course_key = self.course.id,
+            url_vimeo = '',
+            status = 'vimeo_encoding',
+            error_description = '',
+            expiry_at=datetime.datetime.utcnow()
+        )
+        EolVimeoVideo.objects.create(
+            edx_video_id = self.video2["edx_video_id"],
+            user =self.user,
+            vimeo_video_id = '9922334455',
+            course_key = self.course.id,
+            url_vimeo = '',
+            status = 'vimeo_upload',
+            error_description = '',
+            expiry_at=datetime.datetime.utcnow()
+        )
+        get_storage.configure_mock(open=Mock(), delete=Mock())
+        get_data = {'uri': '/videos/1122334455', 'name':self.video['client_video_id'], 'status':'available', 'transcode': {'status': 'complete'}, 'duration':self.video['duration'], 'upload': {'status': 'complete'}, 'files': [{'quality': 'hd', 'type': 'source', 'width': 0, 'height': 0, 'link': 'https://player.vimeo.com/external/1122233344', 'created_time': '2021-06-08T14:21:04+00:00', 'fps': 30, 'size': 0, 'md5': None, 'public_name': 'HD 720p', 'size_short': ''}]}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:{'data': [get_data]}),]
+        vimeo_utils.update_video_vimeo(str(self.course.id), batch_size=100)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(get.call_args[0][0], 'https://api.vimeo.com/me/videos')
+        self.assertEqual(sorted(get.call_args[1]['params']['uris'].split(',')), ['/videos/1122334455', '/videos/9922334455'])
+        eolvimeo1 = EolVimeoVideo.objects.get(edx_video_id=self.video["edx_video_id"])
+        eolvimeo2 = EolVimeoVideo.objects.get(edx_video_id=self.video2["edx_video_id"])
+        self.assertEqual(eolvimeo1.status, 'upload_completed')
+        self.assertEqual(eolvimeo1.url_vimeo, get_data['files'][0]['link'])
+        self.assertEqual(eolvimeo2.status, 'vimeo_not_found')
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_get_batch_video_vimeo_fallback(self, get):
+        """
+            Test get_batch_video_vimeo get the videos one by one when the batch request fails
+        """
+        get_data = {'name': 'test', 'status': 'available'}
+        get.side_effect = [
+            namedtuple("Request", ["status_code", "json"])(500, lambda:{'error': 'error'}),
+            namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),
+            namedtuple("Request", ["status_code", "json"])(404, lambda:{'error': 'error'}),
+        ]
+        result = vimeo_utils.get_batch_video_vimeo(['1122334455', '9922334455'])
+        self.assertEqual(result, [get_data, {}])
+        self.assertEqual(get.call_count, 3)
+
+    @patch('requests.Session.get')
+    @patch("eol_vimeo.vimeo_utils.save_videos_vimeo", wraps=vimeo_utils.save_videos_vimeo)
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_update_video_vimeo_bulk_update(self, save_videos, get):
+        """
+            Test update_video_vimeo write the videos in chunks
+        """
+        for edx_video_id, vimeo_video_id in [(self.video["edx_video_id"], '1122334455'), (self.video2["edx_video_id"], '9922334455'), ('111-222-333', '5522334455')]:
+            EolVimeoVideo.objects.create(
+                edx_video_id = edx_video_id,
+                user =self.user,
+                vimeo_video_id = vimeo_video_id,
+                course_key = self.course.id,
+                url_vimeo = '',
+                status = 'vimeo_encoding',
+                error_description = 'No se pudo obtener los links del video en Vimeo. ',
+                token = 'token_test',
+                expiry_at=datetime.datetime.utcnow()
+            )
+        get_data2 = {'name':self.video2['client_video_id'], 'status':'available', 'upload': {'status': 'in_progress'}}
+        get_data3 = {'name':'test3.mp4', 'status':'available', 'upload': {'status': 'complete'}, 'files': []}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(404, lambda:{}),namedtuple("Request", ["status_code", "json"])(200, lambda:get_data2),namedtuple("Request", ["status_code", "json"])(200, lambda:get_data3),]
+        vimeo_utils.update_video_vimeo(str(self.course.id), bulk_size=1000)
+        self.assertEqual(save_videos.call_count, 1)
+        self.assertEqual(len(save_videos.call_args[0][0]), 3)
+        eolvimeo1 = EolVimeoVideo.objects.get(edx_video_id=self.video["edx_video_id"])
+        eolvimeo2 = EolVimeoVideo.objects.get(edx_video_id=self.video2["edx_video_id"])
+        eolvimeo3 = EolVimeoVideo.objects.get(edx_video_id='111-222-333')
+        self.assertEqual(eolvimeo1.status, 'vimeo_not_found')
+        self.assertEqual(eolvimeo1.token, 'token_test')
+        self.assertEqual(eolvimeo2.status, 'vimeo_upload')
+        self.assertEqual(eolvimeo2.error_description, 'Vimeo todavía está subiendo el video.')
+        self.assertEqual(eolvimeo3.status, 'vimeo_encoding')
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_METRICS_ENABLED=True)
+    def test_get_video_vimeo_metrics(self, get):
+        """
+            Test the calls to vimeo are counted by endpoint, status and caller
+        """
+        vimeo_metrics.reset_sinks()
+        self.addCleanup(vimeo_metrics.reset_sinks)
+        get.side_effect = [
+            namedtuple("Request", ["status_code", "json"])(200, lambda:{'name': 'test'}),
+            namedtuple("Request", ["status_code", "json"])(404, lambda:{'error': 'not found'}),
+        ]
+        vimeo_utils.get_video_vimeo('1122334455')
+        vimeo_utils.get_video_vimeo('5544332211')
+        metrics = vimeo_metrics.render_prometheus()
+        self.assertIn('eol_vimeo_api_requests_total{caller="get_video_vimeo",endpoint="/videos/{id}",method="get",status="200"} 1', metrics)
+        self.assertIn('eol_vimeo_api_requests_total{caller="get_video_vimeo",endpoint="/videos/{id}",method="get",status="404"} 1', metrics)
+        self.assertIn('eol_vimeo_api_request_seconds_count{caller="get_video_vimeo",endpoint="/videos/{id}",method="get"} 2', metrics)
+        with override_settings(EOL_VIMEO_METRICS_ENABLED=False):
+            get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:{'name': 'test'})]
+            vimeo_utils.get_video_vimeo('1122334455')
+        self.assertEqual(vimeo_metrics.render_prometheus(), metrics)
+
+    @patch('eol_vimeo.vimeo_client.time.sleep')
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_RATE_LIMIT_RETRIES=1)
+    def test_get_video_vimeo_rate_limit_retry(self, get, sleep):
+        """
+            Test a request limited by vimeo (429) is retried after the reset time
+        """
+        self.addCleanup(vimeo_client.reset_client)
+        Response = namedtuple("Request", ["status_code", "json", "headers"])
+        get_data = {'name': 'test', 'status': 'available'}
+        get.side_effect = [
+            Response(429, lambda:{'error': 'Too many API requests'}, {'Retry-After': '5'}),
+            Response(200, lambda:get_data, {'X-RateLimit-Remaining': '99', 'X-RateLimit-Reset': '2100-01-01T00:00:00+00:00'}),
+        ]
+        self.assertEqual(vimeo_utils.get_video_vimeo('1122334455'), get_data)
+        self.assertEqual(get.call_count, 2)
+        self.assertTrue(0 < sleep.call_args[0][0] <= 5)
+        limiter = vimeo_client.get_rate_limiter()
+        self.assertEqual(limiter.remaining, 99)
+
+    @patch('eol_vimeo.vimeo_client.time.sleep')
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_RATE_LIMIT_RETRIES=0)
+    def test_update_video_vimeo_rate_limit(self, get, sleep):
+        """
+            Test update_video_vimeo does not change the video when the request is limited by vimeo
+        """
+        self.addCleanup(vimeo_client.reset_client)
+        EolVimeoVideo.objects.create(
+            edx_video_id = self.video["edx_video_id"],
+            user =self.user,
+            vimeo_video_id = '1122334455',
+            course_key = self.course.id,
+            url_vimeo = '',
+            status = 'vimeo_encoding',
+            error_description = 'Vimeo todavía está procesando el video.'
+        )
+        get.side_effect = [namedtuple("Request", ["status_code", "json", "headers"])(429, lambda:{'error': 'Too many API requests'}, {}),]
+        vimeo_utils.update_video_vimeo(str(self.course.id))
+        eolvimeo = EolVimeoVideo.objects.get(edx_video_id=self.video["edx_video_id"])
+        self.assertEqual(eolvimeo.status, 'vimeo_encoding')
+        self.assertEqual(eolvimeo.error_description, 'Vimeo todavía está procesando el video.')
+
+    @patch('eol_vimeo.vimeo_client.time.time')
+    def test_rate_limiter_pacing(self, mock_time):
+        """
+            Test RateLimiter spread the remaining requests until the reset time
+        """
+        mock_time.return_value = 1000.0
+        limiter = vimeo_client.RateLimiter()
+        self.assertEqual(limiter.delay(), 0)
+        limiter.update(SimpleNamespace(headers={'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '1020'}))
+        self.assertEqual(limiter.delay(), 0)
+        self.assertEqual(limiter.delay(), 2)
+        self.assertEqual(limiter.remaining, 8)
+        limiter.update(SimpleNamespace(headers={'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1970-01-01T00:17:00+00:00'}))
+        self.assertEqual(limiter.delay(), 20)
+        mock_time.return_value = 1021.0
+        self.assertEqual(limiter.delay(), 0)
+        self.assertEqual(limiter.remaining, None)
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_POLL_BACKOFF={'vimeo_upload': 60, 'vimeo_encoding': 120})
+    @override_settings(EOL_VIMEO_POLL_MAX_INTERVAL=3600)
+    def test_update_video_vimeo_schedule(self, get):
+        """
+            Test update_video_vimeo only check the videos due and schedule the next check with backoff
+        """
+        now = datetime.datetime.now(pytz.utc)
+        EolVimeoVideo.objects.create(
+            edx_video_id = self.video["edx_video_id"],
+            user =self.user,
+            vimeo_video_id = '1122334455',
+            course_key = self.course.id,
+            url_vimeo = '',
+            status = 'vimeo_encoding',
+            error_description = '',
+            expiry_at=now,
+            next_check_at=now - datetime.timedelta(seconds=10),
+            check_attempts=2
+        )
+        EolVimeoVideo.objects.create(
+            edx_video_id = self.video2["edx_video_id"],
+            user =self.user,
+            vimeo_video_id = '9922334455',
+            course_key = self.course.id,
+            url_vimeo = '',
+            status = 'vimeo_encoding',
+            error_description = '',
+            expiry_at=now,
+            next_check_at=now + datetime.timedelta(hours=1),
+            check_attempts=5
+        )
+        get_data = {'name':self.video['client_video_id'], 'status':'available', 'transcode': {'status': 'in_progress'}, 'duration':self.video['duration'], 'upload': {'status': 'complete'}, 'files': [{'quality': 'hd'}]}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        vimeo_utils.update_video_vimeo(str(self.course.id))
+        self.assertEqual(get.call_count, 1)
+        eolvimeo1 = EolVimeoVideo.objects.get(edx_video_id=self.video["edx_video_id"])
+        eolvimeo2 = EolVimeoVideo.objects.get(edx_video_id=self.video2["edx_video_id"])
+        self.assertEqual(eolvimeo1.check_attempts, 3)
+        self.assertTrue(now + datetime.timedelta(seconds=470) < eolvimeo1.next_check_at < now + datetime.timedelta(seconds=600))
+        self.assertEqual(eolvimeo2.check_attempts, 5)
+
+    def test_schedule_video_vimeo(self):
+        """
+            Test schedule_video_vimeo backoff by status and age
+        """
+        now = datetime.datetime.now(pytz.utc)
+        with override_settings(EOL_VIMEO_POLL_BACKOFF={'vimeo_upload': 60, 'vimeo_encoding': 120}, EOL_VIMEO_POLL_MAX_INTERVAL=3600):
+            video = SimpleNamespace(status='vimeo_upload', check_attempts=0, next_check_at=None, expiry_at=now)
+            vimeo_utils.schedule_video_vimeo(video, 'vimeo_upload', now)
+            self.assertEqual(video.next_check_at, now + datetime.timedelta(seconds=60))
+            video.status = 'vimeo_encoding'
+            vimeo_utils.schedule_video_vimeo(video, 'vimeo_upload', now)
+            self.assertEqual(video.check_attempts, 1)
+            self.assertEqual(video.next_check_at, now + datetime.timedelta(seconds=120))
+            video.check_attempts = 10
+            vimeo_utils.schedule_video_vimeo(video, 'vimeo_encoding', now)
+            self.assertEqual(video.next_check_at, now + datetime.timedelta(seconds=3600))
+            video = SimpleNamespace(status='vimeo_encoding', check_attempts=0, next_check_at=None, expiry_at=now - datetime.timedelta(hours=25))
+            vimeo_utils.schedule_video_vimeo(video, 'vimeo_encoding', now)
+            self.assertEqual(video.next_check_at, now + datetime.timedelta(seconds=3600))
+            video.status = 'upload_completed'
+            vimeo_utils.schedule_video_vimeo(video, 'vimeo_encoding', now)
+            self.assertEqual(video.next_check_at, None)
+            self.assertEqual(video.check_attempts, 0)
+
+    def test_get_storage_cached(self):
+        """
+            Test get_storage build the storage once and rebuild it when VIMEO_STORAGE_CLASS change
+        """
+        vimeo_utils.reset_storage()
+        self.addCleanup(vimeo_utils.reset_storage)
+        storage_class = {'class': 'django.core.files.storage.FileSystemStorage', 'options': {'location': '/tmp/eolvimeo-a'}}
+        with override_settings(VIMEO_STORAGE_CLASS=storage_class):
+            storage = vimeo_utils.get_storage()
+            self.assertIs(vimeo_utils.get_storage(), storage)
+        storage_class = {'class': 'django.core.files.storage.FileSystemStorage', 'options': {'location': '/tmp/eolvimeo-b'}}
+        with override_settings(VIMEO_STORAGE_CLASS=storage_class):
+            storage2 = vimeo_utils.get_storage()
+            self.assertIsNot(storage2, storage)
+            self.assertEqual(storage2.location, '/tmp/eolvimeo-b')
+            vimeo_utils.reset_storage()
+            self.assertIsNot(vimeo_utils.get_storage(), storage2)
+
+    @override_settings(EOL_VIMEO_PERMISSION_CACHE_TIMEOUT=60)
+    def test_utils_validate_user_cached(self):
+        """
+            Test validate_user load the course once and cache the decision
+        """
+        with patch('common.djangoapps.student.models.cc.User.save'):
+            instructor = UserFactory(username='instructor_cache', password='12345', email='instructor_cache@edx.org')
+            student = UserFactory(username='student_cache', password='12345', email='student_cache@edx.org')
+        CourseInstructorRole(self.course.id).add_users(instructor)
+        with patch('eol_vimeo.vimeo_utils.get_course_with_access', wraps=vimeo_utils.get_course_with_access) as mock_course:
+            self.assertTrue(vimeo_utils.validate_user(instructor, str(self.course.id)))
+            self.assertTrue(vimeo_utils.validate_user(instructor, str(self.course.id)))
+            self.assertEqual(mock_course.call_count, 1)
+            self.assertFalse(vimeo_utils.validate_user(student, str(self.course.id)))
+            self.assertEqual(mock_course.call_count, 2)
+            # other request of the same user, served by the cache
+            self.assertTrue(vimeo_utils.validate_user(type(instructor).objects.get(id=instructor.id), str(self.course.id)))
+            self.assertEqual(mock_course.call_count, 2)
+            self.assertTrue(vimeo_utils.validate_user(self.user, str(self.course.id)))
+            self.assertEqual(mock_course.call_count, 2)
+
+    def test_classify_video_vimeo(self):
+        """
+            Test classify_video_vimeo decisions without side effects
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        video = SimpleNamespace(status='vimeo_upload', course_key=self.course.id, expiry_at=now - datetime.timedelta(hours=3), edx_video_id='123', vimeo_video_id='456')
+        hd_file = {'quality': 'hd', 'height': 720, 'fps': 30, 'size': 10, 'link': 'https://vimeo.test/hd', 'public_name': 'HD 720p'}
+        sd_file = {'quality': 'sd', 'height': 540, 'fps': 30, 'size': 5, 'link': 'https://vimeo.test/sd', 'public_name': 'SD 540p'}
+        data = {'name': '{}_test.mp4'.format(self.course.id), 'status': 'available', 'duration': 10, 'upload': {'status': 'complete'}, 'transcode': {'status': 'complete'}}
+        decision = vimeo_utils.classify_video_vimeo(video, {}, now)
+        self.assertEqual(decision, vimeo_utils.VideoDecision('vimeo_not_found', 'No se pudo obtener el video en Vimeo.', None, 'vimeo_not_found', None, 'EolVimeo - Video not found in vimeo, edx_video_id: {edx_video_id}'))
+        decision = vimeo_utils.classify_video_vimeo(video, dict(data, upload={'status': 'in_progress'}), now)
+        self.assertEqual((decision.status, decision.edxval_status), ('vimeo_upload', 'vimeo_upload'))
+        decision = vimeo_utils.classify_video_vimeo(video, dict(data, files=[]), now)
+        self.assertEqual((decision.status, decision.error_description, decision.edxval_status), ('vimeo_upload', 'No se pudo obtener los links del video en Vimeo. ', None))
+        decision = vimeo_utils.classify_video_vimeo(video, dict(data, files=[hd_file]), now)
+        self.assertEqual(decision, vimeo_utils.VideoDecision('upload_completed', 'upload_completed', 'https://vimeo.test/hd', None, ('https://vimeo.test/hd', 10, 'test.mp4', 10, 'upload_completed'), None))
+        decision = vimeo_utils.classify_video_vimeo(video, dict(data, files=[sd_file]), now)
+        self.assertEqual((decision.status, decision.url_vimeo), ('upload_completed_encoding', 'https://vimeo.test/sd'))
+        decision = vimeo_utils.classify_video_vimeo(video, dict(data, files=[sd_file]), now + datetime.timedelta(hours=22))
+        self.assertEqual(decision.status, 'upload_completed')
+        decision = vimeo_utils.classify_video_vimeo(video, dict(data, status='quota_exceeded', files=[hd_file]), now)
+        self.assertEqual((decision.status, decision.error_description), ('upload_failed', 'Video no se subió correctamente a Vimeo.status=quota_exceeded'))
+        self.assertEqual(video.status, 'vimeo_upload')
+
+    def test_duplicate_all_video_bulk(self):
+        """
+            Test duplicate all video vimeo with bulk_create and the edxval courses in batch
+        """
+        for edx_video_id, course_key in [(self.video["edx_video_id"], self.course.id), (self.video2["edx_video_id"], self.course.id), (self.video2["edx_video_id"], self.course2.id)]:
+            EolVimeoVideo.objects.create(
+                edx_video_id = edx_video_id,
+                user =self.user,
+                vimeo_video_id = '1122334455',
+                course_key = course_key,
+                url_vimeo = 'url_video_vimeo',
+                status = 'upload_completed',
+                error_description = ''
+            )
+        with self.assertNumQueries(3):
+            vimeo_utils.duplicate_all_video(self.course.id, self.course2.id, self.user2)
+        self.assertEqual(EolVimeoVideo.objects.filter(course_key=self.course2.id).count(), 2)
+        self.assertEqual(EolVimeoVideo.objects.get(course_key=self.course2.id, edx_video_id=self.video["edx_video_id"]).user, self.user2)
+        self.assertEqual(EolVimeoVideo.objects.get(course_key=self.course2.id, edx_video_id=self.video2["edx_video_id"]).user, self.user)
+        self.assertFalse({str(self.course2.id): None} in get_video_info(self.video["edx_video_id"])['courses'])
+        EolVimeoVideo.objects.filter(course_key=self.course2.id).delete()
+        vimeo_utils.duplicate_all_video(self.course.id, self.course2.id, link_edxval=True)
+        self.assertEqual(EolVimeoVideo.objects.filter(course_key=self.course2.id).count(), 2)
+        self.assertTrue({str(self.course2.id): None} in get_video_info(self.video["edx_video_id"])['courses'])
+        self.assertTrue({str(self.course2.id): None} in get_video_info(self.video2["edx_video_id"])['courses'])
+        self.assertEqual(vimeo_utils.link_videos_to_course([self.video["edx_video_id"]], self.course2.id), [self.video["edx_video_id"]])
+
+    def test_duplicate_videos(self):
+        """
+            Test duplicate many videos with one query per step and the edxval courses in batch
+        """
+        for edx_video_id in [self.video["edx_video_id"], self.video2["edx_video_id"]]:
+            EolVimeoVideo.objects.create(
+                edx_video_id = edx_video_id,
+                user =self.user,
+                vimeo_video_id = '1122334455',
+                course_key = self.course.id,
+                url_vimeo = 'url_video_vimeo',
+                status = 'upload_completed',
+                error_description = ''
+            )
+        vimeo_utils.link_videos_to_course([self.video2["edx_video_id"]], self.course2.id)
+        ids = [self.video["edx_video_id"], self.video2["edx_video_id"], '456-456789-456', self.video["edx_video_id"]]
+        with self.assertLogs('eol_vimeo.vimeo_utils', level='INFO') as cm:
+            with self.assertNumQueries(6):
+                result = vimeo_utils.duplicate_videos(ids, self.course.id, self.course2.id, self.user2)
+        self.assertEqual(result, [self.video["edx_video_id"], self.video2["edx_video_id"]])
+        self.assertEqual(EolVimeoVideo.objects.filter(course_key=self.course2.id, user=self.user2).count(), 2)
+        self.assertTrue({str(self.course2.id): None} in get_video_info(self.video["edx_video_id"])['courses'])
+        self.assertTrue(any(
+        f'EOLVimeo - Error duplicate video, edx_video_id: {self.video2["edx_video_id"]} with course: {self.course2.id} already exists in edxval' in log
+        for log in cm.output))
+        self.assertTrue(any(
+        f'EOLVimeo - Error duplicate video, edx_video_id: 456-456789-456 with course: {self.course.id} does not exist or already exists in course: {self.course2.id}' in log
+        for log in cm.output))
+        with self.assertLogs('eol_vimeo.vimeo_utils', level='INFO') as cm:
+            self.assertEqual(vimeo_utils.duplicate_videos(ids, self.course.id, self.course2.id), [])
+        self.assertEqual(len([x for x in cm.output if 'does not exist or already exists in course' in x]), 3)
+
+    @patch('requests.Session.put')
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_DOMAINS=['test.cl', 'studio.test.cl', 'lms.test.cl'])
+    def test_add_domain_to_video_concurrent(self, get, put):
+        """
+            Test add_domain_to_video send the domains concurrently and skip the whitelisted ones
+        """
+        put.return_value = namedtuple("Request", ["status_code"])(204)
+        self.assertTrue(vimeo_utils.add_domain_to_video('123456789'))
+        self.assertEqual(put.call_count, 3)
+        self.assertEqual(get.call_count, 0)
+        self.assertEqual(sorted(x[0][0] for x in put.call_args_list), [
+            'https://api.vimeo.com/videos/123456789/privacy/domains/lms.test.cl',
+            'https://api.vimeo.com/videos/123456789/privacy/domains/studio.test.cl',
+            'https://api.vimeo.com/videos/123456789/privacy/domains/test.cl',
+        ])
+        put.reset_mock()
+        put.side_effect = [namedtuple("Request", ["status_code", "json"])(403, lambda:{'error': 'forbidden'})]
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:{'data': [{'domain': 'test.cl'}, {'domain': 'lms.test.cl'}]})]
+        with override_settings(EOL_VIMEO_DOMAINS_SKIP_EXISTING=True):
+            self.assertFalse(vimeo_utils.add_domain_to_video('123456789'))
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual([x[0][0] for x in put.call_args_list], ['https://api.vimeo.com/videos/123456789/privacy/domains/studio.test.cl'])
+
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_get_folder_id_cached(self, get, post):
+        """
+            Test get_folder_id search the folder by name once and cache its id, numeric names are ids
+        """
+        get_data = {'data': [{'uri': '/users/112233/projects/111', 'name': 'other'}], 'paging': {'next': '/me/projects?page=2'}}
+        get_data2 = {'data': [{'uri': '/users/112233/projects/995577', 'name': 'EOL'}], 'paging': {'next': None}}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data), namedtuple("Request", ["status_code", "json"])(200, lambda:get_data2),]
+        client = vimeo_utils.get_client_vimeo()
+        self.assertEqual(vimeo_utils.get_folder_id(client, '12345'), '12345')
+        self.assertEqual(vimeo_utils.get_folder_id(client, 'EOL'), '995577')
+        self.assertEqual(vimeo_utils.get_folder_id(client, 'EOL'), '995577')
+        self.assertEqual(get.call_count, 2)
+        post.assert_not_called()
+
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_get_folder_id_not_found(self, get, post):
+        """
+            Test get_folder_id does not create the folder if it does not exist
+        """
+        get_data = {'data': [], 'paging': {'next': None}}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        client = vimeo_utils.get_client_vimeo()
+        self.assertIsNone(vimeo_utils.get_folder_id(client, 'EOL'))
+        self.assertIsNone(cache.get(vimeo_utils.get_folder_cache_key('EOL')))
+        post.assert_not_called()
+
+    @patch('requests.Session.put')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_move_videos_to_folder(self, put):
+        """
+            Test move_videos_to_folder move all the videos with one request
+        """
+        put.side_effect = [namedtuple("Request", ["status_code"])(204),]
+        result = vimeo_utils.move_videos_to_folder(['111', '222', '333'], '12345')
+        self.assertEqual(result, ['111', '222', '333'])
+        self.assertEqual(put.call_count, 1)
+        self.assertTrue(put.call_args[0][0].endswith('/me/projects/12345/videos'))
+        self.assertEqual(put.call_args[1]['params'], {'uris': '/videos/111,/videos/222,/videos/333'})
+
+    @patch('requests.Session.put')
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_move_videos_to_folder_fail_forget_folder(self, get, put):
+        """
+            Test move_videos_to_folder drop the cached id of the folder when the move fails
+        """
+        get_data = {'data': [{'uri': '/users/112233/projects/995577', 'name': 'EOL'}], 'paging': {'next': None}}
+        put_data = {'error': 'The folder does not exist'}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        put.side_effect = [namedtuple("Request", ["status_code", "json"])(404, lambda:put_data),]
+        result = vimeo_utils.move_videos_to_folder(['111', '222'], 'EOL')
+        self.assertEqual(result, [])
+        self.assertIsNone(cache.get(vimeo_utils.get_folder_cache_key('EOL')))
+
+    @override_settings(EOL_VIMEO_RATE_LIMIT_RETRIES=0)
+    @override_settings(EOL_VIMEO_RATE_LIMIT_MAX_WAIT=0)
+    def test_async_fetch_videos_vimeo(self):
+        """
+            Test the async client fetch the data of the videos in the same order with at most
+            `concurrency` requests in flight, None if the rate limit was exceeded
+        """
+        class FakeHttp(object):
+            in_flight = 0
+            max_in_flight = 0
+
+            async def request(self, method, url, **kwargs):
+                FakeHttp.in_flight += 1
+                FakeHttp.max_in_flight = max(FakeHttp.max_in_flight, FakeHttp.in_flight)
+                await asyncio.sleep(0)
+                FakeHttp.in_flight -= 1
+                id_video = url.split('/')[-1]
+                if id_video == '3':
+                    return SimpleNamespace(status_code=429, headers={}, json=lambda:{'error': 'Too many API requests'}, text='')
+                return SimpleNamespace(status_code=200, headers={}, json=lambda:{'name': id_video, 'status': 'available'}, text='')
+
+            async def aclose(self):
+                pass
+
+        videos = [SimpleNamespace(vimeo_video_id=str(x)) for x in range(1, 6)]
+        with patch('eol_vimeo.vimeo_async.AsyncVimeoClient.build_client', return_value=FakeHttp()):
+            result = list(vimeo_async.fetch_videos_vimeo(videos, concurrency=2))
+        self.assertEqual([x[0] for x in result], videos)
+        self.assertEqual([x[1] and x[1]['name'] for x in result], ['1', '2', None, '4', '5'])
+        self.assertEqual(FakeHttp.max_in_flight, 2)
+
+    def test_async_request_headers(self):
+        """
+            Test the async client keep the headers of the caller when it sends a json body
+        """
+        http = MagicMock()
+
+        async def request(method, url, **kwargs):
+            return SimpleNamespace(status_code=200, headers={}, text='')
+        http.request.side_effect = request
+
+        async def send():
+            with patch('eol_vimeo.vimeo_async.AsyncVimeoClient.build_client', return_value=http):
+                client = vimeo_async.AsyncVimeoClient(concurrency=1)
+            return await client.put('/videos/1', data={'name': 'test'}, headers={'If-Match': 'etag'})
+        asyncio.run(send())
+        self.assertEqual(http.request.call_args[1]['headers'], {'If-Match': 'etag', 'Content-Type': 'application/json'})
+
+    def test_get_pending_videos_filters(self):
+        """
+            Test get_pending_videos with status, shard, limit and age filters
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for i in range(6):
+            EolVimeoVideo.objects.create(
+                edx_video_id='pending-{}'.format(i),
+                user=self.user,
+                vimeo_video_id=str(i),
+                course_key=self.course.id,
+                status='vimeo_upload' if i % 2 else 'vimeo_encoding',
+                expiry_at=now - datetime.timedelta(hours=i),
+                next_check_at=now - datetime.timedelta(minutes=i)
+            )
+        ids = set(vimeo_utils.get_pending_videos(now).values_list('id', flat=True))
+        shards = [set(vimeo_utils.get_pending_videos(now, shard=(i, 3)).values_list('id', flat=True)) for i in range(3)]
+        self.assertEqual(set().union(*shards), ids)
+        self.assertEqual(sum(len(x) for x in shards), len(ids))
+        self.assertEqual(vimeo_utils.get_pending_videos(now, status=['vimeo_upload']).count(), 3)
+        self.assertEqual(vimeo_utils.get_pending_videos(now, course_id=str(self.course2.id)).count(), 0)
+        self.assertEqual([x.edx_video_id for x in vimeo_utils.get_pending_videos(now, limit=2)], ['pending-5', 'pending-4'])
+        older = vimeo_utils.get_pending_videos(now, older_than=datetime.timedelta(hours=3), newer_than=datetime.timedelta(hours=5))
+        self.assertEqual(sorted(x.edx_video_id for x in older), ['pending-3', 'pending-4'])
+
+    def test_claim_videos_disjoint(self):
+        """
+            Test two pollers claim disjoint videos and release their leases
+        """
+        for i in range(4):
+            EolVimeoVideo.objects.create(edx_video_id='lease-{}'.format(i), user=self.user, vimeo_video_id=str(i), course_key=self.course.id, status='vimeo_encoding')
+        now = datetime.datetime.now(datetime.timezone.utc)
+        poller_a = vimeo_utils.claim_videos(vimeo_utils.get_pending_videos(now), 'poller-a', batch_size=2)
+        claimed_a = [next(poller_a), next(poller_a)]
+        claimed_b = list(vimeo_utils.claim_videos(vimeo_utils.get_pending_videos(now), 'poller-b', batch_size=2))
+        claimed_a.extend(poller_a)
+        self.assertEqual([x.edx_video_id for x in claimed_a], ['lease-0', 'lease-1'])
+        self.assertEqual([x.edx_video_id for x in claimed_b], ['lease-2', 'lease-3'])
+        self.assertEqual(vimeo_utils.release_videos('poller-a'), 2)
+        self.assertEqual(EolVimeoVideo.objects.filter(lease_owner='poller-b').count(), 2)
+        EolVimeoVideo.objects.filter(lease_owner='poller-b').update(lease_expires_at=now - datetime.timedelta(seconds=1))
+        self.assertEqual(len(list(vimeo_utils.claim_videos(vimeo_utils.get_pending_videos(now), 'poller-c', limit=3))), 3)
+
+    def test_claim_videos_expired_lease(self):
+        """
+            Test a run does not claim again its videos when their leases expire
+        """
+        for i in range(3):
+            EolVimeoVideo.objects.create(edx_video_id='lease-{}'.format(i), user=self.user, vimeo_video_id=str(i), course_key=self.course.id, status='vimeo_encoding')
+        now = datetime.datetime.now(datetime.timezone.utc)
+        claimed = []
+        for video in vimeo_utils.claim_videos(vimeo_utils.get_pending_videos(now, due_only=False), 'poller-a', batch_size=1):
+            claimed.append(video.edx_video_id)
+            EolVimeoVideo.objects.filter(id=video.id).update(lease_expires_at=now - datetime.timedelta(seconds=1))
+        self.assertEqual(claimed, ['lease-0', 'lease-1', 'lease-2'])
+
+    @patch('eol_vimeo.vimeo_utils.fetch_videos_vimeo')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_update_video_vimeo_skip_leased(self, fetch_videos_vimeo):
+        """
+            Test update_video_vimeo skip the videos leased by other poller and release its leases
+        """
+        fetched = []
+        fetch_videos_vimeo.side_effect = lambda videos, workers, batch_size: [fetched.append(x.edx_video_id) or (x, None) for x in videos]
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)
+        EolVimeoVideo.objects.create(edx_video_id='lease-0', user=self.user, vimeo_video_id='0', course_key=self.course.id, status='vimeo_encoding')
+        EolVimeoVideo.objects.create(edx_video_id='lease-1', user=self.user, vimeo_video_id='1', course_key=self.course.id, status='vimeo_encoding', lease_owner='other', lease_expires_at=expires_at)
+        vimeo_utils.update_video_vimeo()
+        self.assertEqual(fetched, ['lease-0'])
+        self.assertEqual(EolVimeoVideo.objects.get(edx_video_id='lease-0').lease_owner, '')
+        self.assertEqual(EolVimeoVideo.objects.get(edx_video_id='lease-1').lease_owner, 'other')
+
+    @patch('eol_vimeo.vimeo_utils.fetch_videos_vimeo')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_update_video_vimeo_claim_before_fetch(self, fetch_videos_vimeo):
+        """
+            Test update_video_vimeo claim the videos before their fetch, so the claim is not timed as fetch
+        """
+        fetched = []
+        fetch_videos_vimeo.side_effect = lambda videos, workers, batch_size: fetched.append(videos) or [(x, None) for x in videos]
+        for i in range(3):
+            EolVimeoVideo.objects.create(edx_video_id='lease-{}'.format(i), user=self.user, vimeo_video_id=str(i), course_key=self.course.id, status='vimeo_encoding')
+        vimeo_utils.update_video_vimeo()
+        self.assertEqual(len(fetched), 1)
+        self.assertIsInstance(fetched[0], list)
+        self.assertEqual([x.edx_video_id for x in fetched[0]], ['lease-0', 'lease-1', 'lease-2'])
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_sync_video_vimeo(self, get):
+        """
+            Test the incremental sync only update the pending videos modified since the high-water mark
+        """
+        for edx_video_id, vimeo_video_id in [(self.video["edx_video_id"], '111'), (self.video2["edx_video_id"], '222')]:
+            EolVimeoVideo.objects.create(edx_video_id=edx_video_id, user=self.user, vimeo_video_id=vimeo_video_id, course_key=self.course.id, status='vimeo_encoding', error_description='')
+        mark = datetime.datetime(2021, 6, 8, 12, 0, tzinfo=datetime.timezone.utc)
+        EolVimeoSyncState.objects.create(name='modified_time', high_water_mark=mark)
+        get_data = {'data': [
+            {'uri': '/videos/111', 'modified_time': '2021-06-08T14:00:00+00:00', 'status': 'uploading_error', 'upload': {'status': 'error'}},
+            {'uri': '/videos/333', 'modified_time': '2021-06-08T13:00:00+00:00', 'status': 'available', 'upload': {'status': 'complete'}},
+            {'uri': '/videos/222', 'modified_time': '2021-06-08T11:00:00+00:00', 'status': 'uploading_error', 'upload': {'status': 'error'}},
+        ], 'paging': {'next': '/me/videos?page=2'}}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        self.assertEqual(vimeo_utils.sync_video_vimeo(), 1)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(get.call_args[1]['params']['sort'], 'modified_time')
+        self.assertEqual(EolVimeoVideo.objects.get(vimeo_video_id='111').status, 'upload_failed')
+        self.assertEqual(EolVimeoVideo.objects.get(vimeo_video_id='222').status, 'vimeo_encoding')
+        self.assertEqual(EolVimeoVideo.objects.filter(lease_owner='').count(), 2)
+        self.assertEqual(EolVimeoSyncState.objects.get(name='modified_time').high_water_mark, datetime.datetime(2021, 6, 8, 14, 0, tzinfo=datetime.timezone.utc))
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_sync_video_vimeo_stale(self, get):
+        """
+            Test the incremental sync poll the old pending videos not modified in vimeo, so they can become stale
+        """
+        expiry_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=30)
+        EolVimeoVideo.objects.create(edx_video_id=self.video["edx_video_id"], user=self.user, vimeo_video_id='444', course_key=self.course.id, status='vimeo_encoding', error_description='', expiry_at=expiry_at)
+        EolVimeoSyncState.objects.create(name='modified_time', high_water_mark=datetime.datetime(2021, 6, 8, 12, 0, tzinfo=datetime.timezone.utc))
+        get_data = {'data': [], 'paging': {'next': None}}
+        get_data2 = {'name': self.video['client_video_id'], 'status': 'available', 'transcode': {'status': 'complete'}, 'duration': self.video['duration'], 'upload': {'status': 'complete'}, 'files': [{'quality': 'hls', 'type': 'source', 'width': 0, 'height': 0, 'link': 'https://player.vimeo.com/external/1122233344.m3u8', 'fps': 30, 'size': 0, 'public_name': 'HLS'}]}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data), namedtuple("Request", ["status_code", "json"])(200, lambda:get_data2),]
+        self.assertEqual(vimeo_utils.sync_video_vimeo(), 0)
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(EolVimeoVideo.objects.get(vimeo_video_id='444').status, 'upload_failed')
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_sync_video_vimeo_skip_leased(self, get):
+        """
+            Test the incremental sync does not update the videos leased by a poller
+        """
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)
+        EolVimeoVideo.objects.create(edx_video_id=self.video["edx_video_id"], user=self.user, vimeo_video_id='111', course_key=self.course.id, status='vimeo_encoding', error_description='', lease_owner='poller', lease_expires_at=expires_at)
+        EolVimeoSyncState.objects.create(name='modified_time', high_water_mark=datetime.datetime(2021, 6, 8, 12, 0, tzinfo=datetime.timezone.utc))
+        get_data = {'data': [{'uri': '/videos/111', 'modified_time': '2021-06-08T14:00:00+00:00', 'status': 'uploading_error', 'upload': {'status': 'error'}}], 'paging': {'next': None}}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        self.assertEqual(vimeo_utils.sync_video_vimeo(), 0)
+        video = EolVimeoVideo.objects.get(vimeo_video_id='111')
+        self.assertEqual((video.status, video.lease_owner), ('vimeo_encoding', 'poller'))
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_sync_video_vimeo_error_keep_mark(self, get):
+        """
+            Test the incremental sync does not move the high-water mark if a page fails
+        """
+        mark = datetime.datetime(2021, 6, 8, 12, 0, tzinfo=datetime.timezone.utc)
+        EolVimeoSyncState.objects.create(name='modified_time', high_water_mark=mark)
+        get_data = {'data': [{'uri': '/videos/333', 'modified_time': '2021-06-08T13:00:00+00:00', 'status': 'available', 'upload': {'status': 'complete'}}], 'paging': {'next': '/me/videos?page=2'}}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data), namedtuple("Request", ["status_code", "json"])(500, lambda:{}),]
+        self.assertEqual(vimeo_utils.sync_video_vimeo(), 0)
+        self.assertEqual(EolVimeoSyncState.objects.get(name='modified_time').high_water_mark, mark)
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_VIDEO_CACHE_TIMEOUT=60)
+    def test_get_video_vimeo_not_modified(self, get):
+        """
+            Test get_video_vimeo send If-None-Match with the cached ETag and return the cached data on 304
+        """
+        vimeo_utils.reset_video_cache()
+        get_data = {'name': 'test', 'status': 'available', 'files': [{'quality': 'hd'}]}
+        response = namedtuple("Request", ["status_code", "json", "headers"])
+        get.side_effect = [response(200, lambda:get_data, {'ETag': '"abc"'}), response(304, lambda:{}, {}), response(304, lambda:{}, {})]
+        self.assertEqual(vimeo_utils.get_video_vimeo('1122334455'), get_data)
+        self.assertFalse('If-None-Match' in get.call_args[1]['headers'])
+        self.assertEqual(vimeo_utils.get_video_vimeo('1122334455'), get_data)
+        self.assertEqual(get.call_args[1]['headers']['If-None-Match'], '"abc"')
+        vimeo_utils.reset_video_cache()
+        self.assertEqual(vimeo_utils.get_video_vimeo('1122334455'), get_data)
+        self.assertEqual(get.call_count, 3)
+        vimeo_utils.reset_video_cache()
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_VIDEO_CACHE_SIZE=1)
+    def test_get_video_vimeo_cache_lru(self, get):
+        """
+            Test the video data cache keep only EOL_VIMEO_VIDEO_CACHE_SIZE videos and ignore responses without ETag
+        """
+        vimeo_utils.reset_video_cache()
+        response = namedtuple("Request", ["status_code", "json", "headers"])
+        get.side_effect = [response(200, lambda:{'name': '1'}, {'ETag': '"1"'}), response(200, lambda:{'name': '2'}, {'Last-Modified': 'Tue, 08 Jun 2021 14:21:04 GMT'}), response(200, lambda:{'name': '3'}, {})]
+        vimeo_utils.get_video_vimeo('1')
+        vimeo_utils.get_video_vimeo('2')
+        vimeo_utils.get_video_vimeo('3')
+        self.assertIsNone(vimeo_utils.get_cached_video('1'))
+        self.assertEqual(vimeo_utils.get_cached_video('2')['last_modified'], 'Tue, 08 Jun 2021 14:21:04 GMT')
+        self.assertIsNone(vimeo_utils.get_cached_video('3'))
+        vimeo_utils.reset_video_cache()
+
+    def test_apply_decisions_vimeo_rollback(self):
+        """
+            Test apply_decisions_vimeo does not update edxval when the save of the batch fails
+        """
+        video = EolVimeoVideo.objects.create(edx_video_id=self.video["edx_video_id"], user=self.user, vimeo_video_id='111', course_key=self.course.id, status='vimeo_encoding', error_description='')
+        decision = vimeo_utils.make_decision(*vimeo_utils.STATUS_DECISIONS['upload_error'])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with patch('eol_vimeo.vimeo_utils.save_videos_vimeo', side_effect=Exception('Database error')):
+            with self.assertRaises(Exception):
+                vimeo_utils.apply_decisions_vimeo([(video, decision)], now)
+        self.assertEqual(get_video_info(self.video["edx_video_id"])['status'], 'vimeo_upload')
+        self.assertEqual(EolVimeoVideo.objects.get(id=video.id).status, 'vimeo_encoding')
+
     def test_utils_validate_course_wrong_course_id(self):
         """
             Test validate_course when course id is wrong
@@ -1223,6 +2058,62 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         mock_progress_instance.update_task_state.assert_called_once_with(extra_meta={'step': 'Uploading Video to Vimeo'})
         self.assertEqual(result, "updated_state")
 
+    @patch('eol_vimeo.vimeo_task.update_create_vimeo_model')
+    @patch('eol_vimeo.vimeo_task.upload_vimeo')
+    @patch('eol_vimeo.vimeo_task.chord')
+    @patch('eol_vimeo.vimeo_task.TaskProgress')
+    @override_settings(EOL_VIMEO_UPLOAD_CONCURRENCY=2)
+    def test_task_get_data_fan_out(self, mock_task_progress, mock_chord, mock_upload_vimeo, mock_update_model):
+        """
+            Test task_get_data dispatch one subtask per video, EOL_VIMEO_UPLOAD_CONCURRENCY at a time
+        """
+        course_id = CourseKey.from_string('course-v1:test+T101+2025')
+        data = [
+            {'edxVideoId': 'video1', 'status': 'upload_completed', 'message': ''},
+            {'edxVideoId': 'video2', 'status': 'upload_failed', 'message': 'error'},
+            {'edxVideoId': 'video3', 'status': 'upload_completed', 'message': ''},
+            {'edxVideoId': 'video4', 'status': 'upload_completed', 'message': ''},
+        ]
+        task_input = {'user': 42, 'data': data, 'name_folder': 'test_folder', 'domain': 'example.com'}
+        vimeo_task.task_get_data(None, 7, course_id, task_input, 'Upload to Vimeo')
+        mock_upload_vimeo.assert_not_called()
+        mock_update_model.assert_called_once_with('video2', 42, 'upload_failed', 'error', str(course_id), vimeo_id='')
+        header, callback = mock_chord.call_args[0]
+        self.assertEqual([x.args for x in header], [(data[0], 'example.com', str(course_id)), (data[2], 'example.com', str(course_id))])
+        self.assertEqual(callback.args, ([data[3]], 'test_folder', 'example.com', str(course_id), 42, 7, 0, 0))
+        mock_chord.return_value.apply_async.assert_called_once_with()
+        mock_task_progress.return_value.update_task_state.assert_called_once_with(extra_meta={'step': 'Uploading Video to Vimeo in subtasks', 'subtasks': 3})
+
+    @patch('eol_vimeo.vimeo_task.report_upload_vimeo')
+    @patch('eol_vimeo.vimeo_task.dispatch_upload_vimeo')
+    @patch('eol_vimeo.vimeo_task.move_videos_to_folder', return_value=['111'])
+    @patch('eol_vimeo.vimeo_task.update_create_vimeo_model')
+    def test_save_upload_vimeo_subtasks(self, mock_update_model, mock_move, mock_dispatch, mock_report):
+        """
+            Test the chord callback save the results, dispatch the next videos and report the result after the last ones
+        """
+        course_id = 'course-v1:test+T101+2025'
+        response = [{'edxVideoId': 'video1', 'status': 'vimeo_upload', 'message': '', 'vimeo_id': '111'}, {'edxVideoId': 'video3', 'status': 'upload_failed', 'message': 'No se pudo subir el video a Vimeo. ', 'vimeo_id': ''}]
+        rest = [{'edxVideoId': 'video4', 'status': 'upload_completed', 'message': ''}]
+        result = vimeo_task.save_upload_vimeo_subtasks(response, rest, 'test_folder', 'example.com', course_id, 42, 7)
+        self.assertEqual(result, {'succeeded': 1, 'failed': 1})
+        mock_move.assert_called_once_with(['111'], 'test_folder')
+        mock_update_model.assert_any_call('video1', 42, 'vimeo_upload', '', course_id, vimeo_id='111')
+        mock_update_model.assert_any_call('video3', 42, 'upload_failed', 'No se pudo subir el video a Vimeo. ', course_id, vimeo_id='')
+        mock_dispatch.assert_called_once_with(rest, 'test_folder', 'example.com', course_id, 42, 7, 1, 1)
+        mock_report.assert_not_called()
+        result = vimeo_task.save_upload_vimeo_subtasks(response[:1], [], 'test_folder', 'example.com', course_id, 42, 7, 1, 1)
+        self.assertEqual(result, {'succeeded': 2, 'failed': 1})
+        mock_report.assert_called_once_with(7, 2, 1)
+
+    @patch('eol_vimeo.vimeo_task.upload_video_vimeo', side_effect=Exception('Connection error'))
+    def test_upload_video_vimeo_subtask_error(self, mock_upload_video_vimeo):
+        """
+            Test upload_video_vimeo_subtask return the video as upload_failed when the upload raises
+        """
+        result = vimeo_task.upload_video_vimeo_subtask({'edxVideoId': 'video1', 'status': 'upload_completed'}, 'example.com', 'course-v1:test+T101+2025')
+        self.assertEqual(result, {'edxVideoId': 'video1', 'status': 'upload_failed', 'message': 'No se pudo subir el video a Vimeo. ', 'vimeo_id': ''})
+
     @patch('eol_vimeo.vimeo_task.run_main_task')
     def test_task_process_data(self, mock_run_main_task):
         """
@@ -1343,6 +2234,45 @@ class TestEolVimeo(UrlResetMixin, ModuleStoreTestCase):
         result = vimeo_utils.move_to_folder('test-edx-id', 'folder_test')
         self.assertFalse(result)
 
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_HTTP_TIMEOUT=(2, 10))
+    def test_get_client_vimeo_shared_pool(self, get):
+        """
+            Test get_client_vimeo reuse the same client and connection pool between calls and threads
+        """
+        get_data = {'name':self.video['client_video_id'], 'status':'available', 'upload': {'status': 'complete'}}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        client = vimeo_utils.get_client_vimeo()
+        self.assertIs(client, vimeo_utils.get_client_vimeo())
+        self.assertEqual(vimeo_utils.get_video_vimeo('1122334455'), get_data)
+        self.assertEqual(vimeo_utils.get_video_vimeo('1122334455'), get_data)
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args[0][0], 'https://api.vimeo.com/videos/1122334455')
+        self.assertEqual(get.call_args[1]['timeout'], (2, 10))
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(vimeo_client.get_session()))
+        thread.start()
+        thread.join()
+        session = vimeo_client.get_session()
+        self.assertIsNot(sessions[0], session)
+        self.assertIs(sessions[0].get_adapter('https://api.vimeo.com'), session.get_adapter('https://api.vimeo.com'))
+
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    def test_get_client_vimeo_credentials_changed(self):
+        """
+            Test get_client_vimeo build a new client when credentials change
+        """
+        client = vimeo_utils.get_client_vimeo()
+        with override_settings(EOL_VIMEO_CLIENT_TOKEN='0987654321asdfgh'):
+            client2 = vimeo_utils.get_client_vimeo()
+        self.assertIsNot(client, client2)
+        self.assertEqual(client2.token, '0987654321asdfgh')
+
 class TestEolVimeoView(UrlResetMixin, ModuleStoreTestCase):
     def setUp(self):
         super(TestEolVimeoView, self).setUp()
@@ -1454,6 +2384,27 @@ class TestEolVimeoView(UrlResetMixin, ModuleStoreTestCase):
         self.assertEqual(request.netloc, 's3.test.test.ts')
         self.assertEqual(request.path, '/path-video-s3')
     
+    @patch('eol_vimeo.views.get_url_video')
+    def test_vimeo_callback_cached(self, mock_url_video):
+        """
+            Test vimeo_callback sign the url once and serve the next calls from cache
+        """
+        cache_key = views.get_callback_cache_key(self.video["edx_video_id"], '123asd456asd789asd')
+        cache.delete(cache_key)
+        self.addCleanup(cache.delete, cache_key)
+        mock_url_video.return_value = 'https://s3.test.test.ts/path-video-s3'
+        data = {'videoid': self.video["edx_video_id"], 'token': '123asd456asd789asd'}
+        with self.assertNumQueries(1):
+            result = views.vimeo_callback(RequestFactory().get(reverse('vimeo_callback'), data=data))
+        self.assertEqual(result.status_code, 302)
+        with self.assertNumQueries(0):
+            result = views.vimeo_callback(RequestFactory().get(reverse('vimeo_callback'), data=data))
+        self.assertEqual(result.status_code, 302)
+        self.assertEqual(result.url, 'https://s3.test.test.ts/path-video-s3')
+        self.assertEqual(mock_url_video.call_count, 1)
+        result = self.client.get(reverse('vimeo_callback'), data={'videoid': self.video["edx_video_id"], 'token': 'asdasdadsadad'})
+        self.assertEqual(result.status_code, 400)
+
     def test_vimeo_callback_wrong_token(self):
         """
             Test vimeo_callback when token is wrong
@@ -1586,7 +2537,26 @@ class TestEolVimeoView(UrlResetMixin, ModuleStoreTestCase):
         result =  views.get_url_video('1111111')
         self.assertEqual(result, 'https://s3.test.test.ts/path-video-s3')
     
-    @patch('requests.get')
+    @override_settings(AWS_S3_ENDPOINT_DOMAIN='s3')
+    @patch('eol_vimeo.views.videos.storage_service_key')
+    @patch('eol_vimeo.views.videos.storage_service_bucket')
+    def test_get_url_video_cached_bucket(self, mock_bucket, mock_storage_key):
+        """
+            Test get_url_video open the bucket once and open it again when the S3 settings change
+        """
+        views.reset_storage_bucket()
+        self.addCleanup(views.reset_storage_bucket)
+        mock_bucket.side_effect = ['fake-bucket', 'fake-bucket2']
+        mock_storage_key.return_value.generate_url.return_value = 'https://s3.test.test.ts/path-video-s3'
+        views.get_url_video('1111111')
+        views.get_url_video('2222222')
+        self.assertEqual(mock_bucket.call_count, 1)
+        with override_settings(AWS_S3_ENDPOINT_DOMAIN='s3-2'):
+            views.get_url_video('3333333')
+        self.assertEqual(mock_bucket.call_count, 2)
+        self.assertEqual([x[0][0] for x in mock_storage_key.call_args_list], ['fake-bucket', 'fake-bucket', 'fake-bucket2'])
+
+    @patch('requests.Session.get')
     @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
     @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
@@ -1608,6 +2578,147 @@ class TestEolVimeoView(UrlResetMixin, ModuleStoreTestCase):
         eolvimeo = EolVimeoVideo.objects.get(edx_video_id=self.video3["edx_video_id"], course_key=self.course.id)
         self.assertEqual(eolvimeo.url_picture, 'this is a picture url')
     
+    def send_webhook_event(self, payload, signature=None):
+        """
+            Fake event sender, post the payload signed with EOL_VIMEO_WEBHOOK_SECRET
+        """
+        body = json.dumps(payload).encode('utf-8')
+        if signature is None:
+            signature = vimeo_utils.sign_webhook(body)
+        return Client().post(reverse('vimeo_webhook'), data=body, content_type='application/json', HTTP_X_EOL_VIMEO_SIGNATURE=signature)
+
+    @patch('requests.Session.get')
+    @patch("eol_vimeo.vimeo_utils.get_storage")
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_WEBHOOK_SECRET='webhook_secret')
+    def test_vimeo_webhook(self, get_storage, get):
+        """
+            Test vimeo_webhook update the videos of the event
+        """
+        get_storage.configure_mock(open=Mock(), delete=Mock())
+        get_data = {'name':self.video['client_video_id'], 'status':'available', 'transcode': {'status': 'complete'}, 'duration':self.video['duration'], 'upload': {'status': 'complete'}, 'files': [{'quality': 'hd', 'type': 'source', 'width': 0, 'height': 0, 'link': 'https://player.vimeo.com/external/1122233344', 'created_time': '2021-06-08T14:21:04+00:00', 'fps': 30, 'size': 0, 'md5': None, 'public_name': 'HD 720p', 'size_short': ''}]}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'video': {'uri': '/videos/1122334455'}})
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.json(), {'updated': 2})
+        self.assertEqual(get.call_count, 1)
+        eolvimeo = EolVimeoVideo.objects.get(edx_video_id=self.video["edx_video_id"], course_key=self.course.id)
+        self.assertEqual(eolvimeo.status, 'upload_completed')
+        self.assertEqual(eolvimeo.url_vimeo, get_data['files'][0]['link'])
+
+    @patch('requests.Session.get')
+    @patch("eol_vimeo.vimeo_utils.get_storage")
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_WEBHOOK_SECRET='webhook_secret')
+    def test_vimeo_webhook_skip_leased(self, get_storage, get):
+        """
+            Test vimeo_webhook does not update the videos leased by a poller and release its leases
+        """
+        get_storage.configure_mock(open=Mock(), delete=Mock())
+        get_data = {'name':self.video['client_video_id'], 'status':'available', 'transcode': {'status': 'complete'}, 'duration':self.video['duration'], 'upload': {'status': 'complete'}, 'files': [{'quality': 'hd', 'type': 'source', 'width': 0, 'height': 0, 'link': 'https://player.vimeo.com/external/1122233344', 'created_time': '2021-06-08T14:21:04+00:00', 'fps': 30, 'size': 0, 'md5': None, 'public_name': 'HD 720p', 'size_short': ''}]}
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(200, lambda:get_data),]
+        leased = EolVimeoVideo.objects.filter(vimeo_video_id='1122334455', status='vimeo_upload').order_by('id').first()
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)
+        EolVimeoVideo.objects.filter(id=leased.id).update(lease_owner='poller', lease_expires_at=expires_at)
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'video': {'uri': '/videos/1122334455'}})
+        self.assertEqual(result.json(), {'updated': 1})
+        leased.refresh_from_db()
+        self.assertEqual((leased.status, leased.lease_owner), ('vimeo_upload', 'poller'))
+        self.assertEqual(EolVimeoVideo.objects.exclude(id=leased.id).filter(lease_owner='').count(), EolVimeoVideo.objects.exclude(id=leased.id).count())
+
+    @patch('requests.Session.get')
+    @override_settings(EOL_VIMEO_CLIENT_ID='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_SECRET='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_CLIENT_TOKEN='1234567890asdfgh')
+    @override_settings(EOL_VIMEO_WEBHOOK_SECRET='webhook_secret')
+    def test_vimeo_webhook_ignored(self, get):
+        """
+            Test vimeo_webhook leave the videos untouched with other events or when the video can not be obtained
+        """
+        get.side_effect = [namedtuple("Request", ["status_code", "json"])(500, lambda:{'error': 'Internal error'}),]
+        result = self.send_webhook_event({'event': 'video.upload.complete', 'video': {'uri': '/videos/1122334455'}})
+        self.assertEqual(result.json(), {'updated': 0})
+        get.assert_not_called()
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'video': {'uri': '/videos/1122334455'}})
+        self.assertEqual(result.json(), {'updated': 0})
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(EolVimeoVideo.objects.filter(vimeo_video_id='1122334455', status='vimeo_upload').count(), 2)
+        self.assertEqual(EolVimeoVideo.objects.filter(vimeo_video_id='1122334455').exclude(lease_owner='').count(), 0)
+
+    @override_settings(EOL_VIMEO_WEBHOOK_SECRET='webhook_secret')
+    def test_vimeo_webhook_without_credentials(self):
+        """
+            Test vimeo_webhook does not update the videos when the credentials are not defined
+        """
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'video': {'uri': '/videos/1122334455'}})
+        self.assertEqual(result.json(), {'updated': 0})
+        self.assertEqual(EolVimeoVideo.objects.filter(vimeo_video_id='1122334455', status='vimeo_upload').count(), 2)
+
+    @override_settings(EOL_VIMEO_WEBHOOK_SECRET='webhook_secret')
+    def test_vimeo_webhook_unknown_video(self):
+        """
+            Test vimeo_webhook when there is no pending video with the vimeo id
+        """
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'uri': '/videos/5555555'})
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.json(), {'updated': 0})
+
+    @override_settings(EOL_VIMEO_WEBHOOK_SECRET='webhook_secret')
+    def test_vimeo_webhook_wrong_request(self):
+        """
+            Test vimeo_webhook with wrong signature, method or payload
+        """
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'uri': '/videos/1122334455'}, signature='sha256=1234')
+        self.assertEqual(result.status_code, 403)
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'uri': '/users/1122334455'})
+        self.assertEqual(result.status_code, 400)
+        result = self.client.get(reverse('vimeo_webhook'))
+        self.assertEqual(result.status_code, 400)
+
+    def test_vimeo_webhook_disabled(self):
+        """
+            Test vimeo_webhook when EOL_VIMEO_WEBHOOK_SECRET is not defined
+        """
+        result = self.send_webhook_event({'event': 'video.transcode.complete', 'uri': '/videos/1122334455'}, signature='')
+        self.assertEqual(result.status_code, 404)
+
+    @override_settings(EOL_VIMEO_METRICS_TOKEN='metrics_token')
+    def test_vimeo_metrics(self):
+        """
+            Test vimeo_metrics render the metrics of the process in Prometheus format
+        """
+        vimeo_metrics.reset_sinks()
+        self.addCleanup(vimeo_metrics.reset_sinks)
+        result = self.client.get(reverse('vimeo_metrics'))
+        self.assertEqual(result.status_code, 404)
+        with override_settings(EOL_VIMEO_METRICS_ENABLED=True):
+            self.client.get(reverse('vimeo_callback'), data={'videoid': '456-456789-456', 'token': '123asd456asd789asd'})
+            result = self.client.get(reverse('vimeo_metrics'))
+            self.assertEqual(result.status_code, 403)
+            result = self.client.get(reverse('vimeo_metrics'), HTTP_AUTHORIZATION='Bearer metrics_token')
+        self.assertEqual(result.status_code, 200)
+        self.assertTrue(result['Content-Type'].startswith('text/plain; version=0.0.4'))
+        metrics = result.content.decode('utf-8')
+        self.assertIn('eol_vimeo_callback_cache_total{result="miss"} 1', metrics)
+        self.assertIn('eol_vimeo_view_requests_total{status="400",view="callback"} 1', metrics)
+
+    @override_settings(EOL_VIMEO_METRICS_ENABLED=True)
+    @override_settings(EOL_VIMEO_METRICS_TOKEN='')
+    def test_vimeo_metrics_without_token(self):
+        """
+            Test vimeo_metrics do not render the metrics when EOL_VIMEO_METRICS_TOKEN is not defined
+        """
+        vimeo_metrics.reset_sinks()
+        self.addCleanup(vimeo_metrics.reset_sinks)
+        result = self.client.get(reverse('vimeo_metrics'))
+        self.assertEqual(result.status_code, 403)
+        result = self.client.get(reverse('vimeo_metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(result.status_code, 403)
+
     def test_update_create_vimeo_model_normal_process(self):
         """
             Test update or create vimeo model normal process
@@ -1700,3 +2811,156 @@ class CommandTest(TestCase):
         self.assertTrue(any(
         'EolVimeoCommand - Running vimeo_utils.update_video_vimeo()' in log
         for log in cm.output))
+
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    def test_command_workers(self, mock_update_video_vimeo):
+        """
+        Test vimeo_update_url_videos with --workers
+        """
+        call_command('vimeo_update_url_videos', '--workers', '8', stdout=StringIO())
+        mock_update_video_vimeo.assert_called_once_with(workers=8, batch_size=None, bulk_size=None, due_only=True, concurrency=None)
+
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    def test_command_batch_size(self, mock_update_video_vimeo):
+        """
+        Test vimeo_update_url_videos with --batch-size
+        """
+        call_command('vimeo_update_url_videos', '--batch-size', '50', stdout=StringIO())
+        mock_update_video_vimeo.assert_called_once_with(workers=1, batch_size=50, bulk_size=None, due_only=True, concurrency=None)
+        with self.assertRaises(CommandError):
+            call_command('vimeo_update_url_videos', '--batch-size', '101', stdout=StringIO())
+
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    def test_command_ignore_schedule(self, mock_update_video_vimeo):
+        """
+        Test vimeo_update_url_videos with --ignore-schedule
+        """
+        call_command('vimeo_update_url_videos', '--ignore-schedule', stdout=StringIO())
+        mock_update_video_vimeo.assert_called_once_with(workers=1, batch_size=None, bulk_size=None, due_only=False, concurrency=None)
+
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    def test_command_timings(self, mock_update_video_vimeo):
+        """
+        Test vimeo_update_url_videos with --timings print the phases of the run
+        """
+        def update_video_vimeo(**kwargs):
+            for value in [0.1, 0.2, 0.3, 0.4]:
+                vimeo_metrics.observe('eol_vimeo_poll_phase_seconds', value, phase='fetch')
+            vimeo_metrics.increment('eol_vimeo_poll_videos_total', status='upload_completed')
+        mock_update_video_vimeo.side_effect = update_video_vimeo
+        out = StringIO()
+        call_command('vimeo_update_url_videos', '--timings', stdout=out)
+        self.assertIn('eol_vimeo_poll_phase_seconds{phase="fetch"}: count=4 total=1.000s p50=0.2000s p95=0.4000s max=0.4000s', out.getvalue())
+        self.assertIn('eol_vimeo_poll_videos_total{status="upload_completed"}: 1', out.getvalue())
+        self.assertFalse(vimeo_metrics.enabled())
+
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    def test_command_profile(self, mock_update_video_vimeo):
+        """
+        Test vimeo_update_url_videos with --profile write a pstats dump
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'poller.pstats')
+            call_command('vimeo_update_url_videos', '--profile', path, stdout=StringIO())
+            self.assertTrue(pstats.Stats(path).total_calls > 0)
+        mock_update_video_vimeo.assert_called_once_with(workers=1, batch_size=None, bulk_size=None, due_only=True, concurrency=None)
+
+    @patch('eol_vimeo.vimeo_async.is_available', return_value=True)
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    def test_command_async(self, mock_update_video_vimeo, mock_is_available):
+        """
+        Test vimeo_update_url_videos with --async and --concurrency
+        """
+        call_command('vimeo_update_url_videos', '--async', stdout=StringIO())
+        mock_update_video_vimeo.assert_called_once_with(workers=1, batch_size=None, bulk_size=None, due_only=True, concurrency=settings.EOL_VIMEO_ASYNC_CONCURRENCY)
+        mock_update_video_vimeo.reset_mock()
+        call_command('vimeo_update_url_videos', '--async', '--concurrency', '300', stdout=StringIO())
+        mock_update_video_vimeo.assert_called_once_with(workers=1, batch_size=None, bulk_size=None, due_only=True, concurrency=300)
+        with self.assertRaises(CommandError):
+            call_command('vimeo_update_url_videos', '--async', '--concurrency', '0', stdout=StringIO())
+
+    @patch('eol_vimeo.vimeo_async.is_available', return_value=False)
+    def test_command_async_without_httpx(self, mock_is_available):
+        """
+        Test vimeo_update_url_videos with --async when httpx is not installed
+        """
+        with self.assertRaises(CommandError):
+            call_command('vimeo_update_url_videos', '--async', stdout=StringIO())
+
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    def test_command_filters(self, mock_update_video_vimeo):
+        """
+        Test vimeo_update_url_videos with --course, --status, --shard, --limit, --older-than and --newer-than
+        """
+        call_command(
+            'vimeo_update_url_videos', '--course', 'course-v1:mss+999+2020', '--status', 'vimeo_upload', '--status', 'vimeo_encoding',
+            '--shard', '1/4', '--limit', '500', '--older-than', '30m', '--newer-than', '7d', stdout=StringIO())
+        mock_update_video_vimeo.assert_called_once_with(
+            workers=1, batch_size=None, bulk_size=None, due_only=True, concurrency=None, course_id='course-v1:mss+999+2020',
+            status=['vimeo_upload', 'vimeo_encoding'], shard=(1, 4), limit=500,
+            older_than=datetime.timedelta(minutes=30), newer_than=datetime.timedelta(days=7))
+
+    def test_command_filters_invalid(self):
+        """
+        Test vimeo_update_url_videos with wrong filters
+        """
+        for args in [['--shard', '4/4'], ['--shard', 'a'], ['--older-than', '2w'], ['--status', 'vimeo_patch'], ['--limit', '0'], ['--course', 'wrong']]:
+            with self.assertRaises(CommandError):
+                call_command('vimeo_update_url_videos', *args, stdout=StringIO())
+
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.update_video_vimeo')
+    @patch('eol_vimeo.management.commands.vimeo_update_url_videos.sync_video_vimeo')
+    def test_command_sync(self, mock_sync_video_vimeo, mock_update_video_vimeo):
+        """
+        Test vimeo_update_url_videos with --sync
+        """
+        call_command('vimeo_update_url_videos', '--sync', '--bulk-size', '50', stdout=StringIO())
+        mock_sync_video_vimeo.assert_called_once_with(bulk_size=50)
+        mock_update_video_vimeo.assert_not_called()
+        for args in [['--course', 'course-v1:mss+999+2020'], ['--status', 'vimeo_upload'], ['--shard', '0/2'], ['--limit', '5'], ['--older-than', '1h'], ['--newer-than', '1d'], ['--workers', '4'], ['--batch-size', '1'], ['--ignore-schedule'], ['--concurrency', '10']]:
+            with self.assertRaises(CommandError):
+                call_command('vimeo_update_url_videos', '--sync', *args, stdout=StringIO())
+        self.assertEqual(mock_sync_video_vimeo.call_count, 1)
+
+    def test_command_workers_invalid(self):
+        """
+        Test vimeo_update_url_videos with a wrong number of workers or bulk size
+        """
+        with self.assertRaises(CommandError):
+            call_command('vimeo_update_url_videos', '--workers', '0', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('vimeo_update_url_videos', '--bulk-size', '0', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('vimeo_update_url_videos', '--bulk-size', '-5', stdout=StringIO())
+
+    def test_benchmark_upload_vimeo(self):
+        """
+        Test the upload benchmark against the fake Vimeo API move the uploaded videos to the folder
+        """
+        server = vimeo_benchmark.FakeVimeoServer().start()
+        self.addCleanup(server.stop)
+        with patch('eol_vimeo.vimeo_utils.forget_folder_id') as forget_folder_id:
+            result = vimeo_benchmark.benchmark_upload_vimeo(server, 3)
+        self.assertEqual(result['name'], 'upload_vimeo')
+        self.assertEqual(server.moved, 3)
+        forget_folder_id.assert_not_called()
+        self.assertEqual(EolVimeoVideo.objects.filter(edx_video_id__startswith='eolvimeo-benchmark').count(), 0)
+
+    def test_command_benchmark(self):
+        """
+        Test vimeo_benchmark against the fake Vimeo API, the seeded videos are rolled back
+        """
+        other = EolVimeoVideo.objects.create(edx_video_id='other-video', user=UserFactory(), vimeo_video_id='1', course_key=CourseKey.from_string('course-v1:eol+Other+2026'), status='vimeo_encoding', error_description='')
+        out = StringIO()
+        call_command('vimeo_benchmark', '--videos', '8', '--workers', '2', '--no-upload', '--json', stdout=out)
+        results = [json.loads(x) for x in out.getvalue().splitlines()]
+        self.assertEqual([x['name'] for x in results], ['classify_video_vimeo', 'update_video_vimeo'])
+        self.assertEqual(results[0]['api_calls'], 0)
+        self.assertEqual(results[1]['api_calls'], 8)
+        self.assertTrue(results[1]['db_queries'] > 0)
+        self.assertTrue(all(x['peak_memory'] > 0 for x in results))
+        self.assertEqual(EolVimeoVideo.objects.filter(edx_video_id__startswith='eolvimeo-benchmark').count(), 0)
+        other.refresh_from_db()
+        self.assertEqual((other.status, other.next_check_at, other.lease_owner), ('vimeo_encoding', None, ''))
+        with self.assertRaises(CommandError):
+            call_command('vimeo_benchmark', '--videos', '0', stdout=StringIO())
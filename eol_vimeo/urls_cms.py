@@ -3,7 +3,7 @@
 from django.conf.urls import url
 from django.conf import settings
 
-from .views import vimeo_callback, vimeo_update_picture
+from .views import vimeo_callback, vimeo_metrics, vimeo_update_picture, vimeo_webhook
 
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
@@ -19,4 +19,14 @@ urlpatterns = (
         vimeo_update_picture,
         name='vimeo_update_picture',
     ),
+    url(
+        r'^eolvimeo/webhook',
+        csrf_exempt(vimeo_webhook),
+        name='vimeo_webhook',
+    ),
+    url(
+        r'^eolvimeo/metrics',
+        vimeo_metrics,
+        name='vimeo_metrics',
+    ),
 )
@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
 # Python Standard Libraries
+import copy
+import hashlib
+import hmac
+import json
 import logging
+import os
+import threading
 
 # Installed packages (via pip)
+from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.utils import timezone
+from vimeo.exceptions import APIRateLimitExceededFailure
 
 # Edx dependencies
 from cms.djangoapps.contentstore.views import videos
@@ -12,11 +21,25 @@ from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 
 # Internal project dependencies
-from eol_vimeo.models import EolVimeoVideo
-from eol_vimeo.vimeo_utils import update_image, validate_course, validate_user
+from eol_vimeo.models import EolVimeoVideo, PENDING_STATUS
+from eol_vimeo.vimeo_metrics import enabled as metrics_enabled, increment, instrument_view, render_prometheus
+from eol_vimeo.vimeo_utils import (
+    check_webhook_signature,
+    get_webhook_video_id,
+    update_image,
+    update_video_vimeo_by_id,
+    validate_course,
+    validate_user
+)
 
 logger = logging.getLogger(__name__)
 
+SIGNED_URL_EXPIRATION = 86400
+WEBHOOK_EVENTS = ['video.transcode.complete']
+BUCKET_SETTINGS = ['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SECURITY_TOKEN', 'AWS_S3_ENDPOINT_DOMAIN', 'VIDEO_UPLOAD_PIPELINE']
+_bucket = threading.local()
+
+@instrument_view('callback')
 def vimeo_callback(request):
     """
         Get url to download video 
@@ -29,17 +52,32 @@ def vimeo_callback(request):
         return HttpResponse(status=400)
     edx_video_id = request.GET.get('videoid', '')
     token = request.GET.get('token', '')
-    if not EolVimeoVideo.objects.filter(edx_video_id=edx_video_id, status__in=['vimeo_encoding', 'vimeo_upload', 'upload_completed_encoding'], token=token).exists():
+    cache_key = get_callback_cache_key(edx_video_id, token)
+    upload_url = cache.get(cache_key)
+    if upload_url is not None:
+        increment('eol_vimeo_callback_cache_total', result='hit')
+        return HttpResponseRedirect(upload_url)
+    increment('eol_vimeo_callback_cache_total', result='miss')
+    expiry_at = EolVimeoVideo.objects.filter(edx_video_id=edx_video_id, status__in=PENDING_STATUS, token=token).values_list('expiry_at', flat=True).first()
+    if expiry_at is None:
         logger.error("EolVimeo - Video id have problem, check model, edx_video_id: {}, token: {}".format(edx_video_id, token))
         return HttpResponse(status=400)
-    video_vimeo = EolVimeoVideo.objects.get(edx_video_id=edx_video_id, token=token)
     now = timezone.now()
-    if now >= video_vimeo.expiry_at:
-        logger.error("EolVimeo - expiration date is greater than or equal datetime now, edx_video_id: {}, now: {}, expiry_at: {}".format(edx_video_id, now, video_vimeo.expiry_at))
+    if now >= expiry_at:
+        logger.error("EolVimeo - expiration date is greater than or equal datetime now, edx_video_id: {}, now: {}, expiry_at: {}".format(edx_video_id, now, expiry_at))
         return HttpResponse(status=400)
     upload_url = get_url_video(edx_video_id)
+    timeout = min((expiry_at - now).total_seconds(), SIGNED_URL_EXPIRATION // 2)
+    if timeout >= 1:
+        cache.set(cache_key, upload_url, int(timeout))
     return HttpResponseRedirect(upload_url)
 
+def get_callback_cache_key(edx_video_id, token):
+    """
+        Cache key of the signed url of a validated video id and token
+    """
+    return 'eol_vimeo_callback_{}'.format(hashlib.sha256('{}:{}'.format(edx_video_id, token).encode('utf-8')).hexdigest())
+
 def vimeo_update_picture(request):
     """
         Update video picture
@@ -64,8 +102,75 @@ def vimeo_update_picture(request):
     response = update_image(edx_video_id, course_key)
     return JsonResponse(response)
 
+@instrument_view('webhook')
+def vimeo_webhook(request):
+    """
+        Receive a vimeo event signed with EOL_VIMEO_WEBHOOK_SECRET and update the status
+        of the video without waiting for vimeo_update_url_videos, only the events
+        of WEBHOOK_EVENTS are processed
+    """
+    if request.method != "POST":
+        return HttpResponse(status=400)
+    if settings.EOL_VIMEO_WEBHOOK_SECRET == '':
+        return HttpResponse(status=404)
+    if not check_webhook_signature(request.body, request.META.get('HTTP_X_EOL_VIMEO_SIGNATURE', '')):
+        logger.error("EolVimeo - Webhook with wrong signature")
+        return HttpResponse(status=403)
+    try:
+        payload = json.loads(request.body.decode('utf-8'))
+    except ValueError:
+        logger.error("EolVimeo - Webhook body is not a valid json")
+        return HttpResponse(status=400)
+    vimeo_video_id = get_webhook_video_id(payload) if isinstance(payload, dict) else None
+    if vimeo_video_id is None:
+        logger.error("EolVimeo - Webhook without video uri, payload: {}".format(payload))
+        return HttpResponse(status=400)
+    event = payload.get('event', payload.get('type', ''))
+    if event not in WEBHOOK_EVENTS:
+        logger.info("EolVimeo - Webhook event {} ignored, id_vimeo: {}".format(event, vimeo_video_id))
+        return JsonResponse({'updated': 0})
+    try:
+        updated = update_video_vimeo_by_id(vimeo_video_id)
+    except APIRateLimitExceededFailure:
+        logger.info("EolVimeo - Webhook rate limit exceeded, id_vimeo: {}".format(vimeo_video_id))
+        return HttpResponse(status=503)
+    logger.info("EolVimeo - Webhook event {}, id_vimeo: {}, videos updated: {}".format(event, vimeo_video_id, updated))
+    return JsonResponse({'updated': updated})
+
+def vimeo_metrics(request):
+    """
+        Metrics of the process in the Prometheus text format,
+        the request must send 'Authorization: Bearer <EOL_VIMEO_METRICS_TOKEN>'
+    """
+    if not metrics_enabled():
+        return HttpResponse(status=404)
+    token = settings.EOL_VIMEO_METRICS_TOKEN
+    if not token or not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer {}'.format(token)):
+        return HttpResponse(status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def get_storage_bucket():
+    """
+        Get the bucket of the video pipeline, the S3 connection is opened
+        once per thread (boto connections are not thread-safe) and rebuilt
+        if the S3 settings change or the process was forked
+    """
+    config = [getattr(settings, name, None) for name in BUCKET_SETTINGS]
+    pid = os.getpid()
+    if getattr(_bucket, 'bucket', None) is None or _bucket.pid != pid or _bucket.config != config:
+        _bucket.bucket = videos.storage_service_bucket()
+        _bucket.pid = pid
+        _bucket.config = copy.deepcopy(config)
+    return _bucket.bucket
+
+def reset_storage_bucket():
+    """
+        Drop the bucket of the current thread
+    """
+    _bucket.bucket = None
+
 def get_url_video(edx_video_id):
-    bucket = videos.storage_service_bucket()
+    bucket = get_storage_bucket()
     key = videos.storage_service_key(bucket, file_name=edx_video_id)
-    upload_url = key.generate_url(86400, 'GET')
+    upload_url = key.generate_url(SIGNED_URL_EXPIRATION, 'GET')
     return upload_url
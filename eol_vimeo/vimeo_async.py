@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# Python Standard Libraries
+from __future__ import unicode_literals
+import asyncio
+import json
+import logging
+import time
+
+# Installed packages (via pip)
+from django.conf import settings
+import vimeo
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Internal project dependencies
+from . import vimeo_metrics, vimeo_utils
+from .vimeo_client import get_http_config, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+VIDEO_FIELDS = "name,duration,files,upload,status,transcode"
+
+
+def is_available():
+    """
+        The async client needs httpx (pip install httpx[http2])
+    """
+    return httpx is not None
+
+
+class AsyncVimeoClient(object):
+    """
+        asyncio Vimeo client over one httpx.AsyncClient, the requests are
+        multiplexed over HTTP/2 when h2 is installed. It shares the rate
+        limiter of the process with the sync client. It is only used by the
+        poller to get the video data, the uploads use the sync client.
+    """
+
+    def __init__(self, concurrency=None, transport=None):
+        if concurrency is None:
+            concurrency = settings.EOL_VIMEO_ASYNC_CONCURRENCY
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = get_rate_limiter()
+        self.client = self.build_client(concurrency, transport)
+
+    def build_client(self, concurrency, transport=None):
+        """
+            httpx.AsyncClient used to send the requests
+        """
+        if httpx is None:
+            raise ImportError('httpx is required by the async Vimeo client')
+        timeout = get_http_config()[1]
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        return httpx.AsyncClient(
+            base_url=settings.EOL_VIMEO_API_URL,
+            http2=h2 is not None,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=settings.EOL_VIMEO_HTTP_POOL_SIZE),
+            headers={
+                'Accept': vimeo.VimeoClient.ACCEPT_HEADER,
+                'User-Agent': vimeo.VimeoClient.USER_AGENT,
+                'Authorization': 'bearer {}'.format(settings.EOL_VIMEO_CLIENT_TOKEN),
+            },
+            transport=transport
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def request(self, method, url, data=None, **kwargs):
+        """
+            Send one request, at most `concurrency` requests are in flight,
+            429 responses are retried like in the sync client
+        """
+        if data is not None:
+            kwargs['content'] = json.dumps(data)
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **{'Content-Type': 'application/json'})
+        labels = None
+        if vimeo_metrics.enabled():
+            labels = {'endpoint': vimeo_metrics.get_endpoint(url), 'method': method, 'caller': 'async'}
+        for attempt in range(settings.EOL_VIMEO_RATE_LIMIT_RETRIES + 1):
+            delay = min(self.limiter.delay(), settings.EOL_VIMEO_RATE_LIMIT_MAX_WAIT)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with self.semaphore:
+                response = await self.send_request(method, url, labels, **kwargs)
+            if response.status_code != 429:
+                self.limiter.update(response)
+                return response
+            self.limiter.throttled(response)
+            logger.info('EolVimeo - Rate limit exceeded, url: {}, attempt: {}'.format(url, attempt + 1))
+        raise vimeo.exceptions.APIRateLimitExceededFailure(response, 'Too many API requests')
+
+    async def send_request(self, method, url, labels, **kwargs):
+        if labels is None:
+            return await self.client.request(method.upper(), url, **kwargs)
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method.upper(), url, **kwargs)
+        except Exception:
+            vimeo_metrics.increment('eol_vimeo_api_requests_total', status='error', **labels)
+            raise
+        vimeo_metrics.increment('eol_vimeo_api_requests_total', status=response.status_code, **labels)
+        vimeo_metrics.observe('eol_vimeo_api_request_seconds', time.perf_counter() - start, **labels)
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request('get', url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request('put', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('post', url, **kwargs)
+
+
+async def get_video_vimeo(client, id_video):
+    """
+        Get the video data from vimeo, None if the rate limit was exceeded
+    """
+    try:
+        response = await client.get('/videos/{}'.format(id_video), params={"fields": VIDEO_FIELDS})
+        if response.status_code == 200:
+            return response.json()
+        logger.info('EolVimeo - The video does not exists, id_video_vimeo:{}, response: {}'.format(id_video, response.text))
+        return {}
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        logger.info('EolVimeo - Rate limit exceeded, id_video_vimeo: {}'.format(id_video))
+        return None
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+        return {}
+
+
+async def get_batch_video_vimeo(client, ids_video):
+    """
+        Get the data of a list of videos (max 100) with one request,
+        if the request fails the videos are requested concurrently one by one
+    """
+    ids = [x for x in ids_video if x]
+    data = {}
+    try:
+        if ids:
+            response = await client.get('/me/videos', params={
+                "uris": ','.join('/videos/{}'.format(x) for x in ids),
+                "fields": "uri," + VIDEO_FIELDS,
+                "per_page": len(ids)
+            })
+            if response.status_code == 200:
+                data = {x['uri'].split('/')[-1]: x for x in response.json()['data']}
+            else:
+                logger.info('EolVimeo - Error to get videos, ids_video_vimeo: {}, response: {}'.format(ids, response.text))
+                data = None
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        logger.info('EolVimeo - Rate limit exceeded, ids_video_vimeo: {}'.format(ids))
+        return [None for x in ids_video]
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+        data = None
+    if data is None:
+        logger.info('EolVimeo - Batch request failed, getting the videos one by one')
+        return await asyncio.gather(*[get_video_vimeo(client, x) for x in ids_video])
+    return [data.get(x, {}) for x in ids_video]
+
+
+def fetch_videos_vimeo(videos, concurrency=None, batch_size=None, transport=None):
+    """
+        Yield (video, video_data) in the same order of videos, like
+        vimeo_utils.fetch_videos_vimeo, keeping up to `concurrency` requests in
+        flight on the current thread. The event loop only runs the requests,
+        the videos are processed by the caller between groups.
+    """
+    if concurrency is None:
+        concurrency = settings.EOL_VIMEO_ASYNC_CONCURRENCY
+    if batch_size:
+        video_chunks = vimeo_utils.chunks(videos, min(batch_size, vimeo_utils.VIMEO_BATCH_SIZE))
+    else:
+        video_chunks = vimeo_utils.chunks(videos, 1)
+    loop = asyncio.new_event_loop()
+    try:
+        client = loop.run_until_complete(create_client(concurrency, transport))
+        try:
+            for group in vimeo_utils.chunks(video_chunks, concurrency * 4):
+                results = loop.run_until_complete(fetch_group(client, group, batch_size))
+                for chunk, data in zip(group, results):
+                    yield from zip(chunk, data)
+        finally:
+            loop.run_until_complete(client.aclose())
+    finally:
+        loop.close()
+
+
+async def create_client(concurrency, transport=None):
+    # the client and its semaphore must be created inside the loop
+    return AsyncVimeoClient(concurrency, transport)
+
+
+async def fetch_group(client, group, batch_size):
+    if batch_size:
+        return await asyncio.gather(*[get_batch_video_vimeo(client, [x.vimeo_video_id for x in chunk]) for chunk in group])
+    results = await asyncio.gather(*[get_video_vimeo(client, chunk[0].vimeo_video_id) for chunk in group])
+    return [[x] for x in results]
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+# Python Standard Libraries
+from __future__ import unicode_literals
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import datetime
+import json
+import logging
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+
+# Installed packages (via pip)
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+# Edx dependencies
+from edxval.api import create_profile, create_video
+from edxval.exceptions import ValCannotCreateError
+from opaque_keys.edx.keys import CourseKey
+
+# Internal project dependencies
+from . import vimeo_client, vimeo_task, vimeo_utils
+from .models import EolVimeoVideo, PENDING_STATUS
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_COURSE = 'course-v1:eol+Benchmark+2026'
+FIRST_VIMEO_ID = 100000
+# scenario of each fake video, chosen with vimeo id % len(SCENARIOS)
+SCENARIOS = ['uploading', 'transcoding', 'hd', 'sd']
+# quality, height, fps, public_name of the realistic files array
+FILE_FORMATS = [
+    ('hls', 0, 30, 'HLS'),
+    ('dash', 0, 30, 'DASH'),
+    ('sd', 240, 30, 'SD 240p'),
+    ('sd', 360, 30, 'SD 360p'),
+    ('sd', 540, 30, 'SD 540p'),
+    ('hd', 720, 30, 'HD 720p'),
+    ('hd', 720, 60, 'HD 720p60'),
+    ('hd', 1080, 30, 'HD 1080p'),
+    ('hd', 1080, 60, 'HD 1080p60'),
+    ('source', 1080, 30, 'Original'),
+]
+
+
+def make_files(vimeo_id, files=6, padding=0):
+    """
+        Files array of a transcoded video, with files entries (the HD ones last)
+        and padding extra bytes in each link to simulate bigger payloads
+    """
+    data = []
+    for quality, height, fps, public_name in FILE_FORMATS[-files:] if files else []:
+        data.append({
+            'quality': quality,
+            'rendition': '{}p'.format(height),
+            'type': 'video/mp4',
+            'width': height * 16 // 9,
+            'height': height,
+            'link': 'https://player.vimeo.com/progressive_redirect/playback/{}/rendition/{}p/file.mp4?loc=external&signature={}{}'.format(vimeo_id, height, 'a' * 64, 'x' * padding),
+            'created_time': '2026-10-18T12:00:00+00:00',
+            'fps': fps,
+            'size': height * 100000,
+            'md5': None,
+            'public_name': public_name,
+            'size_short': '{} MB'.format(height // 10),
+        })
+    return data
+
+
+def make_video_data(vimeo_id, files=6, padding=0):
+    """
+        Payload of GET /videos/<id> for the scenario of the vimeo id
+    """
+    scenario = SCENARIOS[int(vimeo_id) % len(SCENARIOS)]
+    data = {
+        'uri': '/videos/{}'.format(vimeo_id),
+        'name': '{}_benchmark_{}'.format(BENCHMARK_COURSE, vimeo_id),
+        'duration': 120,
+        'status': 'available',
+        'upload': {'status': 'complete'},
+        'transcode': {'status': 'complete'},
+        'files': [],
+    }
+    if scenario == 'uploading':
+        data.update(status='uploading', upload={'status': 'in_progress'})
+    elif scenario == 'transcoding':
+        data.update(status='transcoding', transcode={'status': 'in_progress'}, files=make_files(vimeo_id, 1, padding))
+    elif scenario == 'hd':
+        data['files'] = make_files(vimeo_id, files, padding)
+    else:
+        data['files'] = [x for x in make_files(vimeo_id, len(FILE_FORMATS), padding) if x['quality'] in ['hls', 'dash', 'sd']][-max(files, 1):]
+    return data
+
+
+class FakeVimeoServer(object):
+    """
+        In-process HTTP server with the Vimeo endpoints used by eol_vimeo.
+        latency: seconds added to each response
+        rate_limit: requests allowed per rate_window seconds (None = no limit), with X-RateLimit-* headers
+        files/padding: size of the files array of the videos
+    """
+
+    def __init__(self, latency=0, rate_limit=None, rate_window=60, files=6, padding=0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.files = files
+        self.padding = padding
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.moved = 0
+        self.next_id = FIRST_VIMEO_ID * 10
+        self.window_start = time.time()
+        self.window_calls = 0
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.httpd.server_address[1])
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self)
+
+            def do_POST(self):
+                server.handle(self)
+
+            def do_PUT(self):
+                server.handle(self)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls = 0
+            self.throttled = 0
+            self.moved = 0
+
+    def budget(self):
+        """
+            Spend one request of the rate limit, return (allowed, remaining, reset_at)
+        """
+        with self.lock:
+            self.calls = self.calls + 1
+            now = time.time()
+            if now >= self.window_start + self.rate_window:
+                self.window_start = now
+                self.window_calls = 0
+            reset_at = self.window_start + self.rate_window
+            if self.rate_limit is None:
+                return True, None, reset_at
+            if self.window_calls >= self.rate_limit:
+                self.throttled = self.throttled + 1
+                return False, 0, reset_at
+            self.window_calls = self.window_calls + 1
+            return True, self.rate_limit - self.window_calls, reset_at
+
+    def route(self, method, path, query):
+        """
+            Return (status_code, body) of a request
+        """
+        match = re.match(r'^/videos/(\d+)$', path)
+        if method == 'GET' and match:
+            return 200, make_video_data(match.group(1), self.files, self.padding)
+        if method == 'GET' and path == '/me/videos':
+            uris = query.get('uris', [''])[0].split(',')
+            ids = [x.split('/')[-1] for x in uris if x]
+            return 200, {'total': len(ids), 'data': [make_video_data(x, self.files, self.padding) for x in ids]}
+        if method == 'POST' and path == '/me/videos':
+            with self.lock:
+                self.next_id = self.next_id + 1
+                vimeo_id = self.next_id
+            return 201, {'uri': '/videos/{}'.format(vimeo_id), 'upload': {'status': 'in_progress', 'approach': 'pull'}}
+        if method == 'PUT' and re.match(r'^/me/projects/\w+/videos$', path):
+            uris = [x for x in query.get('uris', [''])[0].split(',') if x]
+            with self.lock:
+                self.moved = self.moved + len(uris)
+            return 204, None
+        if method == 'PUT' and re.match(r'^/me/projects/\w+/videos/\d+$', path):
+            with self.lock:
+                self.moved = self.moved + 1
+            return 204, None
+        if method == 'PUT' and re.match(r'^/videos/\d+/privacy/domains/', path):
+            return 204, None
+        return 404, {'error': 'The requested page could not be found'}
+
+    def handle(self, request):
+        parsed = urllib.parse.urlparse(request.path)
+        length = int(request.headers.get('Content-Length') or 0)
+        if length:
+            request.rfile.read(length)
+        allowed, remaining, reset_at = self.budget()
+        if self.latency:
+            time.sleep(self.latency)
+        if allowed:
+            status_code, body = self.route(request.command, parsed.path, urllib.parse.parse_qs(parsed.query))
+        else:
+            status_code, body = 429, {'error': 'Too many API requests'}
+        content = b'' if body is None else json.dumps(body).encode('utf-8')
+        request.send_response(status_code)
+        request.send_header('Content-Type', 'application/vnd.vimeo.video+json')
+        request.send_header('Content-Length', str(len(content)))
+        if remaining is not None:
+            request.send_header('X-RateLimit-Limit', str(self.rate_limit))
+            request.send_header('X-RateLimit-Remaining', str(remaining))
+            request.send_header('X-RateLimit-Reset', datetime.datetime.fromtimestamp(reset_at, datetime.timezone.utc).isoformat())
+        if not allowed:
+            request.send_header('Retry-After', str(max(int(reset_at - time.time()), 1)))
+        request.end_headers()
+        request.wfile.write(content)
+
+
+@contextmanager
+def fake_vimeo(server):
+    """
+        Send the calls to Vimeo to the fake server and the deleted files to a temporary storage
+    """
+    with tempfile.TemporaryDirectory() as location:
+        storage_class = {'class': 'django.core.files.storage.FileSystemStorage', 'options': {'location': location}}
+        with override_settings(
+                EOL_VIMEO_API_URL=server.url,
+                EOL_VIMEO_CLIENT_ID='benchmark',
+                EOL_VIMEO_CLIENT_SECRET='benchmark',
+                EOL_VIMEO_CLIENT_TOKEN='benchmark',
+                VIMEO_STORAGE_CLASS=storage_class):
+            vimeo_client.reset_client()
+            try:
+                yield server
+            finally:
+                vimeo_client.reset_client()
+                vimeo_utils.reset_storage()
+
+
+def seed_videos(count, statuses=PENDING_STATUS, course_id=BENCHMARK_COURSE):
+    """
+        Create count videos in edxval and EolVimeoVideo, spread across statuses,
+        with vimeo ids from FIRST_VIMEO_ID. Return the list of edx_video_id.
+    """
+    try:
+        create_profile('desktop_mp4')
+    except ValCannotCreateError:
+        pass
+    course_key = CourseKey.from_string(course_id)
+    user, created = User.objects.get_or_create(username='eol_vimeo_benchmark', defaults={'email': 'eol_vimeo_benchmark@example.com'})
+    now = timezone.now()
+    videos = []
+    for i in range(count):
+        edx_video_id = 'eolvimeo-benchmark-{}'.format(i)
+        status = statuses[i % len(statuses)]
+        create_video({
+            'edx_video_id': edx_video_id,
+            'client_video_id': 'benchmark_{}.mp4'.format(i),
+            'duration': 120,
+            'status': status,
+            'courses': [course_id],
+            'encoded_videos': [],
+        })
+        videos.append(EolVimeoVideo(
+            edx_video_id=edx_video_id,
+            user=user,
+            vimeo_video_id=str(FIRST_VIMEO_ID + i),
+            course_key=course_key,
+            status=status,
+            error_description='',
+            token='benchmark{}'.format(i),
+            expiry_at=now - datetime.timedelta(hours=i % 30),
+        ))
+    EolVimeoVideo.objects.bulk_create(videos, batch_size=1000)
+    return [x.edx_video_id for x in videos]
+
+
+@contextmanager
+def rollback():
+    """
+        Run the benchmark in a transaction that is always rolled back
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(name, function, server=None, videos=0):
+    """
+        Run function and return wall time, API calls, DB queries and peak memory.
+        Memory is traced in the same run, so wall time includes the tracemalloc overhead.
+    """
+    if server is not None:
+        server.reset_counters()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            function()
+            wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'name': name,
+        'videos': videos,
+        'wall_time': wall_time,
+        'api_calls': server.calls if server is not None else 0,
+        'throttled': server.throttled if server is not None else 0,
+        'db_queries': len(queries),
+        'peak_memory': peak_memory,
+    }
+
+
+def benchmark_update_video_vimeo(server, videos, workers=1, batch_size=None, bulk_size=None):
+    """
+        Benchmark update_video_vimeo over videos pending videos
+    """
+    with rollback():
+        seed_videos(videos)
+        with fake_vimeo(server):
+            return measure(
+                'update_video_vimeo',
+                lambda: vimeo_utils.update_video_vimeo(course_id=BENCHMARK_COURSE, workers=workers, batch_size=batch_size, bulk_size=bulk_size, due_only=False),
+                server,
+                videos)
+
+
+def benchmark_upload_vimeo(server, videos, name_folder='12345', domain='https://studio.benchmark.test'):
+    """
+        Benchmark upload_vimeo of videos videos with status upload_completed
+    """
+    with rollback():
+        ids = seed_videos(videos, statuses=['upload_completed'])
+        data = [{'edxVideoId': x, 'status': 'upload_completed'} for x in ids]
+        with fake_vimeo(server), override_settings(EOL_VIMEO_DOMAINS=['benchmark.test', 'studio.benchmark.test']):
+            return measure(
+                'upload_vimeo',
+                lambda: vimeo_task.upload_vimeo(data, name_folder, domain, CourseKey.from_string(BENCHMARK_COURSE)),
+                server,
+                videos)
+
+
+def benchmark_classify(videos, files=6, padding=0):
+    """
+        Benchmark get_link_video and classify_video_vimeo without I/O,
+        over the payloads of videos fake videos
+    """
+    now = timezone.now()
+    course_key = CourseKey.from_string(BENCHMARK_COURSE)
+    rows = [EolVimeoVideo(status='vimeo_encoding', course_key=course_key, expiry_at=now - datetime.timedelta(hours=i % 30)) for i in range(videos)]
+    payloads = [make_video_data(FIRST_VIMEO_ID + i, files, padding) for i in range(videos)]
+
+    def run():
+        for video, video_data in zip(rows, payloads):
+            vimeo_utils.classify_video_vimeo(video, video_data, now)
+    return measure('classify_video_vimeo', run, videos=videos)
+
+
+def run_benchmarks(videos=1000, latency=0, rate_limit=None, rate_window=60, files=6, padding=0, workers=1, batch_size=None, bulk_size=None, upload=True):
+    """
+        Run the benchmark suite against a new fake Vimeo server, return a list of results
+    """
+    server = FakeVimeoServer(latency=latency, rate_limit=rate_limit, rate_window=rate_window, files=files, padding=padding).start()
+    try:
+        results = [
+            benchmark_classify(videos, files, padding),
+            benchmark_update_video_vimeo(server, videos, workers, batch_size, bulk_size),
+        ]
+        if upload:
+            results.append(benchmark_upload_vimeo(server, videos))
+        return results
+    finally:
+        server.stop()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# Python Standard Libraries
+from __future__ import unicode_literals
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Installed packages (via pip)
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+import requests
+import vimeo
+
+# Internal project dependencies
+from . import vimeo_metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_local = threading.local()
+_shared = {'pid': None, 'config': None, 'adapter': None, 'client': None, 'limiter': None}
+
+
+def get_http_config():
+    """
+        Get the connection pool configuration from settings
+    """
+    timeout = settings.EOL_VIMEO_HTTP_TIMEOUT
+    if isinstance(timeout, list):
+        timeout = tuple(timeout)
+    return (
+        settings.EOL_VIMEO_HTTP_POOL_SIZE,
+        timeout,
+        settings.EOL_VIMEO_HTTP_KEEP_ALIVE,
+        settings.EOL_VIMEO_HTTP_MAX_RETRIES,
+    )
+
+
+def _get_adapter():
+    """
+        Get the process-wide HTTPAdapter, the adapter owns the urllib3 pool
+        and is rebuilt if the settings change or the process was forked
+        (celery prefork), sockets must not be shared between processes.
+    """
+    config = get_http_config()
+    pid = os.getpid()
+    if _shared['adapter'] is None or _shared['pid'] != pid or _shared['config'] != config:
+        with _lock:
+            if _shared['adapter'] is None or _shared['pid'] != pid or _shared['config'] != config:
+                pool_size, timeout, keep_alive, max_retries = config
+                if _shared['adapter'] is not None and _shared['pid'] == pid:
+                    _shared['adapter'].close()
+                _shared['adapter'] = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=pool_size,
+                    max_retries=max_retries,
+                    pool_block=True
+                )
+                _shared['pid'] = pid
+                _shared['config'] = config
+                _shared['client'] = None
+                _shared['limiter'] = RateLimiter()
+                logger.info('EolVimeo - New HTTP pool, pid: {}, pool_size: {}'.format(pid, pool_size))
+    return _shared['adapter']
+
+
+def get_session():
+    """
+        Get the requests.Session of the current thread.
+        Sessions are per thread (cookies and headers are not thread-safe),
+        but all of them share the same adapter so the warm connections are reused.
+    """
+    adapter = _get_adapter()
+    session = getattr(_local, 'session', None)
+    if session is None or getattr(_local, 'adapter', None) is not adapter:
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not settings.EOL_VIMEO_HTTP_KEEP_ALIVE:
+            session.headers['Connection'] = 'close'
+        _local.session = session
+        _local.adapter = adapter
+    return session
+
+
+def parse_reset(value):
+    """
+        Parse X-RateLimit-Reset (ISO 8601 date or epoch seconds) to epoch seconds
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class RateLimiter(object):
+    """
+        Shared by all the threads of the process, track the remaining Vimeo
+        budget from the X-RateLimit-* headers and pace the requests so the
+        budget is spent evenly until the reset time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining = None
+        self.reset_at = None
+        self.next_slot = 0
+
+    def update(self, response):
+        """
+            Update the budget with the headers of the response
+        """
+        headers = getattr(response, 'headers', None) or {}
+        if 'X-RateLimit-Remaining' not in headers or 'X-RateLimit-Reset' not in headers:
+            return
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset_at = parse_reset(headers['X-RateLimit-Reset'])
+        except (TypeError, ValueError):
+            logger.info('EolVimeo - Wrong rate limit headers, remaining: {}, reset: {}'.format(headers['X-RateLimit-Remaining'], headers['X-RateLimit-Reset']))
+            return
+        with self.lock:
+            self.remaining = remaining
+            self.reset_at = reset_at
+
+    def throttled(self, response):
+        """
+            The response was a 429, no more requests until the reset time
+        """
+        self.update(response)
+        headers = getattr(response, 'headers', None) or {}
+        now = time.time()
+        with self.lock:
+            self.remaining = 0
+            if self.reset_at is None or self.reset_at <= now:
+                try:
+                    self.reset_at = now + float(headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    self.reset_at = now + settings.EOL_VIMEO_RATE_LIMIT_MAX_WAIT
+
+    def delay(self):
+        """
+            Reserve the next request slot, return the seconds to wait for it
+        """
+        now = time.time()
+        with self.lock:
+            if self.reset_at is None or self.reset_at <= now:
+                self.remaining = None
+                self.reset_at = None
+                return 0
+            if self.remaining <= 0:
+                return self.reset_at - now
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + (self.reset_at - now) / self.remaining
+            self.remaining = self.remaining - 1
+            return slot - now
+
+    def wait(self):
+        delay = min(self.delay(), settings.EOL_VIMEO_RATE_LIMIT_MAX_WAIT)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_rate_limiter():
+    """
+        Get the rate limiter of the process
+    """
+    _get_adapter()
+    return _shared['limiter']
+
+
+class PooledVimeoClient(vimeo.VimeoClient):
+    """
+        VimeoClient that sends every request through the pooled sessions
+        instead of the module level functions of requests.
+    """
+
+    def __init__(self, token=None, key=None, secret=None, timeout=None, *args, **kwargs):
+        super(PooledVimeoClient, self).__init__(token=token, key=key, secret=secret, *args, **kwargs)
+        self.credentials = (token, key, secret)
+        self.timeout = timeout
+
+    def __getattr__(self, name):
+        if name not in self.HTTP_METHODS:
+            raise AttributeError("%r is not an HTTP method" % name)
+
+        def caller(url, jsonify=True, **kwargs):
+            headers = kwargs.get('headers', dict())
+            headers['Accept'] = self.ACCEPT_HEADER
+            headers['User-Agent'] = self.USER_AGENT
+            if jsonify and 'data' in kwargs and isinstance(kwargs['data'], (dict, list)):
+                kwargs['data'] = json.dumps(kwargs['data'])
+                headers['Content-Type'] = 'application/json'
+            kwargs['timeout'] = kwargs.get('timeout', self.timeout)
+            kwargs['auth'] = kwargs.get('auth', self._token)
+            kwargs['headers'] = headers
+            if not url[:4] == "http":
+                url = self.API_ROOT + url
+            limiter = get_rate_limiter()
+            labels = None
+            if vimeo_metrics.enabled():
+                labels = {'endpoint': vimeo_metrics.get_endpoint(url), 'method': name, 'caller': sys._getframe(1).f_code.co_name}
+            for attempt in range(settings.EOL_VIMEO_RATE_LIMIT_RETRIES + 1):
+                limiter.wait()
+                response = self.send_request(name, url, labels, **kwargs)
+                if response.status_code != 429:
+                    limiter.update(response)
+                    return response
+                limiter.throttled(response)
+                logger.info('EolVimeo - Rate limit exceeded, url: {}, attempt: {}'.format(url, attempt + 1))
+            raise vimeo.exceptions.APIRateLimitExceededFailure(response, 'Too many API requests')
+        return caller
+
+    def send_request(self, name, url, labels, **kwargs):
+        """
+            Send one request with the session of the thread, with labels
+            the request is counted and its latency observed
+        """
+        if labels is None:
+            return getattr(get_session(), name)(url, **kwargs)
+        start = time.perf_counter()
+        try:
+            response = getattr(get_session(), name)(url, **kwargs)
+        except Exception:
+            vimeo_metrics.increment('eol_vimeo_api_requests_total', status='error', **labels)
+            raise
+        vimeo_metrics.increment('eol_vimeo_api_requests_total', status=response.status_code, **labels)
+        vimeo_metrics.observe('eol_vimeo_api_request_seconds', time.perf_counter() - start, **labels)
+        return response
+
+
+def get_client():
+    """
+        Get the shared vimeo client of the process, it is rebuilt
+        when the credentials, EOL_VIMEO_API_URL or the pool configuration change.
+    """
+    _get_adapter()
+    credentials = (settings.EOL_VIMEO_CLIENT_TOKEN, settings.EOL_VIMEO_CLIENT_ID, settings.EOL_VIMEO_CLIENT_SECRET)
+    client = _shared['client']
+    if client is None or client.credentials != credentials or client.API_ROOT != settings.EOL_VIMEO_API_URL:
+        with _lock:
+            client = _shared['client']
+            if client is None or client.credentials != credentials or client.API_ROOT != settings.EOL_VIMEO_API_URL:
+                client = PooledVimeoClient(
+                    token=settings.EOL_VIMEO_CLIENT_TOKEN,
+                    key=settings.EOL_VIMEO_CLIENT_ID,
+                    secret=settings.EOL_VIMEO_CLIENT_SECRET,
+                    timeout=get_http_config()[1]
+                )
+                client.API_ROOT = settings.EOL_VIMEO_API_URL
+                _shared['client'] = client
+    return client
+
+
+def reset_client():
+    """
+        Close the pooled connections and drop the shared client
+    """
+    with _lock:
+        if _shared['adapter'] is not None and _shared['pid'] == os.getpid():
+            _shared['adapter'].close()
+        _shared.update({'pid': None, 'config': None, 'adapter': None, 'client': None, 'limiter': None})
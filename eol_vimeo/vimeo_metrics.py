@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+# Python Standard Libraries
+from __future__ import unicode_literals
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import cProfile
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+# Installed packages (via pip)
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_lock = threading.Lock()
+_sinks = {'pid': None, 'config': None, 'sinks': []}
+_collectors = []
+
+
+def enabled():
+    """
+        The metrics are recorded only with EOL_VIMEO_METRICS_ENABLED or inside collect()
+    """
+    return settings.EOL_VIMEO_METRICS_ENABLED or bool(_collectors)
+
+
+def get_endpoint(url):
+    """
+        Path of a Vimeo url without the ids, the domains and the query, to be used as label
+    """
+    path = url.split('?')[0]
+    if path.startswith(settings.EOL_VIMEO_API_URL):
+        path = path[len(settings.EOL_VIMEO_API_URL):]
+    path = re.sub(r'(/privacy/domains/)[^/]+', r'\1{domain}', path)
+    return re.sub(r'/\d+', '/{id}', path)
+
+
+class PrometheusRegistry(object):
+    """
+        Default sink, keep the counters and histograms of the process
+        and render them in the Prometheus text format
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            histogram[0][bisect_left(BUCKETS, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        """
+            Metrics in the Prometheus text format (version 0.0.4)
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self.histograms.items())
+        lines = []
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                lines.append('# TYPE {} counter'.format(name))
+                last = name
+            lines.append('{}{} {}'.format(name, format_labels(labels), value))
+        for (name, labels), (buckets, total, count) in histograms:
+            if name != last:
+                lines.append('# TYPE {} histogram'.format(name))
+                last = name
+            cumulative = 0
+            for bound, bucket in zip(list(BUCKETS) + ['+Inf'], buckets):
+                cumulative += bucket
+                lines.append('{}_bucket{} {}'.format(name, format_labels(labels + (('le', str(bound)),)), cumulative))
+            lines.append('{}_sum{} {}'.format(name, format_labels(labels), total))
+            lines.append('{}_count{} {}'.format(name, format_labels(labels), count))
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels) + '}'
+
+
+def get_sinks():
+    """
+        Get the sinks of EOL_VIMEO_METRICS_SINKS (dotted paths of classes with
+        increment(name, value, labels) and observe(name, value, labels)),
+        built once per process
+    """
+    config = list(settings.EOL_VIMEO_METRICS_SINKS)
+    pid = os.getpid()
+    if _sinks['pid'] != pid or _sinks['config'] != config:
+        with _lock:
+            if _sinks['pid'] != pid or _sinks['config'] != config:
+                sinks = []
+                for path in config:
+                    try:
+                        sinks.append(import_string(path)())
+                    except Exception:
+                        logger.exception('EolVimeo - Error loading metrics sink {}'.format(path))
+                _sinks.update({'pid': pid, 'config': config, 'sinks': sinks})
+    return _sinks['sinks']
+
+
+def reset_sinks():
+    """
+        Drop the sinks and their metrics
+    """
+    with _lock:
+        _sinks.update({'pid': None, 'config': None, 'sinks': []})
+
+
+def get_active_sinks():
+    """
+        Sinks of the settings (when enabled) and the collectors of collect()
+    """
+    if settings.EOL_VIMEO_METRICS_ENABLED:
+        return get_sinks() + _collectors
+    return list(_collectors)
+
+
+def increment(name, value=1, **labels):
+    if not enabled():
+        return
+    for sink in get_active_sinks():
+        sink.increment(name, value, labels)
+
+
+def observe(name, value, **labels):
+    if not enabled():
+        return
+    for sink in get_active_sinks():
+        sink.observe(name, value, labels)
+
+
+@contextmanager
+def collect(sink):
+    """
+        Send the metrics of the block (of all the threads of the process) to sink
+        too, even if EOL_VIMEO_METRICS_ENABLED is off. sink None does nothing.
+    """
+    if sink is None:
+        yield sink
+        return
+    with _lock:
+        _collectors.append(sink)
+    try:
+        yield sink
+    finally:
+        with _lock:
+            _collectors.remove(sink)
+
+
+@contextmanager
+def profile(path):
+    """
+        Profile the block with cProfile and write the pstats dump to path, path None does nothing
+    """
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info('EolVimeo - Profile saved in {}'.format(path))
+
+
+class Timings(object):
+    """
+        Sink that keeps every observed value, to report count, total,
+        p50, p95 and max of each histogram
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.samples = {}
+
+    def increment(self, name, value, labels):
+        key = name + format_labels(tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = name + format_labels(tuple(sorted(labels.items())))
+        with self.lock:
+            self.samples.setdefault(key, []).append(value)
+
+    def report(self):
+        """
+            List of {'name', 'count', 'total', 'p50', 'p95', 'max'} sorted by total time
+        """
+        with self.lock:
+            samples = {k: sorted(v) for k, v in self.samples.items()}
+        report = []
+        for key, values in samples.items():
+            report.append({
+                'name': key,
+                'count': len(values),
+                'total': sum(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'max': values[-1],
+            })
+        return sorted(report, key=lambda x: x['total'], reverse=True)
+
+    def format(self):
+        lines = ['{name}: count={count} total={total:.3f}s p50={p50:.4f}s p95={p95:.4f}s max={max:.4f}s'.format(**x) for x in self.report()]
+        with self.lock:
+            lines.extend('{}: {}'.format(k, v) for k, v in sorted(self.counters.items()))
+        return '\n'.join(lines)
+
+
+def percentile(values, percent):
+    """
+        Nearest-rank percentile of sorted values
+    """
+    return values[max(int(math.ceil(percent / 100.0 * len(values))) - 1, 0)]
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+        Observe the seconds of the block in the histogram name
+    """
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(iterable, name, **labels):
+    """
+        Yield the items of iterable, observing the seconds spent waiting for each one
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter() if enabled() else None
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        if start is not None:
+            observe(name, time.perf_counter() - start, **labels)
+        yield item
+
+
+def instrument_view(view_name):
+    """
+        Count the requests of a view by HTTP status and observe their latency
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not enabled():
+                return view(request, *args, **kwargs)
+            start = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            increment('eol_vimeo_view_requests_total', view=view_name, status=response.status_code)
+            observe('eol_vimeo_view_request_seconds', time.perf_counter() - start, view=view_name)
+            return response
+        return wrapper
+    return decorator
+
+
+def render_prometheus():
+    """
+        Metrics of the PrometheusRegistry sinks of the process
+    """
+    return ''.join(x.render() for x in get_sinks() if isinstance(x, PrometheusRegistry))
@@ -1,26 +1,33 @@
 # -*- coding: utf-8 -*-
 # Python Standard Libraries
 from __future__ import unicode_literals
+from contextlib import contextmanager
 from functools import partial
 from time import time
 import logging
+import os
 
 # Installed packages (via pip)
-from celery import task
+from celery import chord, task
+from django.conf import settings
 from django.utils.translation import ugettext_noop
+from vimeo.exceptions import APIRateLimitExceededFailure
 
 # Edx dependencies
 from edxval.api import update_video_status
 from lms.djangoapps.instructor_task.api_helper import submit_task
+from lms.djangoapps.instructor_task.models import InstructorTask
 from lms.djangoapps.instructor_task.tasks_base import BaseInstructorTask
 from lms.djangoapps.instructor_task.tasks_helper.runner import run_main_task, TaskProgress
 from opaque_keys.edx.keys import CourseKey
 
 # Internal project dependencies
+from . import vimeo_metrics
+from .vimeo_metrics import Timings, collect, profile
 from .vimeo_utils import (
     upload,
     add_domain_to_video,
-    move_to_folder,
+    move_videos_to_folder,
     get_video_vimeo,
     update_create_vimeo_model
     )
@@ -35,40 +42,160 @@ def upload_vimeo(data, name_folder, domain, course_id):
     """
     response = []
     for video in data:
-        video_info = {'edxVideoId': video.get('edxVideoId'), 'status':'', 'message': '', 'vimeo_id':''}
         if video.get('status') == 'upload_completed':
-            uri_video = upload(video.get('edxVideoId'), domain, course_id)
-            if uri_video == 'Error':
-                video_info['status'] = 'upload_failed'
-                video_info['message'] = 'No se pudo subir el video a Vimeo. '
-            else:
-                is_added = add_domain_to_video(uri_video.split('/')[-1])
-                if is_added is False:
-                    video_info['message'] = video_info['message'] + 'No se pudo agregar los dominios al video en Vimeo. '
-                    logger.info('{} was dont have domain'.format(uri_video))
-                is_moved = move_to_folder(uri_video.split('/')[-1], name_folder)
-                if is_moved is False:
-                    video_info['message'] = video_info['message'] + 'No se pudo mover el video a la carpeta principal en Vimeo. '
-                    logger.info('{} was not moved'.format(uri_video))
-                video_data = get_video_vimeo(uri_video.split('/')[-1])
-                video_info['vimeo_id'] = uri_video.split('/')[-1]
-                if len(video_data) == 0 or 'upload' not in video_data or video_data['upload']['status'] == 'error':
-                    video_info['status'] = 'upload_failed'
-                    video_info['message'] = video_info['message'] + 'Video no se subió correctamente a Vimeo.'
-                else:
-                    video_info['status'] = 'vimeo_upload'
-            update_video_status(video_info.get('edxVideoId'), video_info['status'])
-            logger.info(
-                u'VIDEOS: Video status update with id [%s], status [%s] and message [%s]',
-                video_info.get('edxVideoId'),
-                video_info.get('status'),
-                video_info.get('message')
-            )
-            response.append(video_info)
+            response.append(upload_video_vimeo(video, domain, course_id))
         else:
             response.append(video)
+    move_uploaded_videos(response, name_folder)
     return response
 
+def move_uploaded_videos(response, name_folder):
+    """
+        Move the uploaded videos of a response of upload_vimeo to the folder with bulk requests
+    """
+    uploaded = [x for x in response if x.get('vimeo_id')]
+    if uploaded:
+        moved = set(move_videos_to_folder(list(dict.fromkeys(x['vimeo_id'] for x in uploaded)), name_folder))
+        for video_info in uploaded:
+            if video_info['vimeo_id'] not in moved:
+                video_info['message'] = video_info['message'] + 'No se pudo mover el video a la carpeta principal en Vimeo. '
+                logger.info('/videos/{} was not moved'.format(video_info['vimeo_id']))
+
+def upload_video_vimeo(video, domain, course_id):
+    """
+        Upload one video with status 'upload_completed' from edxval to vimeo,
+        the video is moved to the folder by upload_vimeo.
+    """
+    video_info = {'edxVideoId': video.get('edxVideoId'), 'status':'', 'message': '', 'vimeo_id':''}
+    uri_video = upload(video.get('edxVideoId'), domain, course_id)
+    if uri_video == 'Error':
+        video_info['status'] = 'upload_failed'
+        video_info['message'] = 'No se pudo subir el video a Vimeo. '
+    else:
+        is_added = add_domain_to_video(uri_video.split('/')[-1])
+        if is_added is False:
+            video_info['message'] = video_info['message'] + 'No se pudo agregar los dominios al video en Vimeo. '
+            logger.info('{} was dont have domain'.format(uri_video))
+        try:
+            video_data = get_video_vimeo(uri_video.split('/')[-1])
+        except APIRateLimitExceededFailure:
+            # the upload was accepted, update_video_vimeo will check the status
+            logger.info('{} status was not checked, rate limit exceeded'.format(uri_video))
+            video_data = None
+        video_info['vimeo_id'] = uri_video.split('/')[-1]
+        if video_data is not None and (len(video_data) == 0 or 'upload' not in video_data or video_data['upload']['status'] == 'error'):
+            video_info['status'] = 'upload_failed'
+            video_info['message'] = video_info['message'] + 'Video no se subió correctamente a Vimeo.'
+        else:
+            video_info['status'] = 'vimeo_upload'
+    with vimeo_metrics.timer('eol_vimeo_upload_phase_seconds', phase='update_video_status'):
+        update_video_status(video_info.get('edxVideoId'), video_info['status'])
+    logger.info(
+        u'VIDEOS: Video status update with id [%s], status [%s] and message [%s]',
+        video_info.get('edxVideoId'),
+        video_info.get('status'),
+        video_info.get('message')
+    )
+    return video_info
+
+def save_upload_vimeo(response, user_id, course_id):
+    """
+        Save the result of upload_vimeo in EolVimeoVideo
+    """
+    with vimeo_metrics.timer('eol_vimeo_upload_phase_seconds', phase='save'):
+        for video in response:
+            update_create_vimeo_model(video['edxVideoId'], user_id, video['status'], video['message'], str(course_id), vimeo_id=video.get('vimeo_id', ''))
+
+@contextmanager
+def upload_instrumentation(name):
+    """
+        With EOL_VIMEO_UPLOAD_TIMINGS log the per-phase timings of the block and
+        with EOL_VIMEO_UPLOAD_PROFILE_DIR write a cProfile dump <name>.pstats there
+    """
+    timings = Timings() if settings.EOL_VIMEO_UPLOAD_TIMINGS else None
+    path = None
+    if settings.EOL_VIMEO_UPLOAD_PROFILE_DIR:
+        path = os.path.join(settings.EOL_VIMEO_UPLOAD_PROFILE_DIR, '{}.pstats'.format(name))
+    with collect(timings), profile(path):
+        yield
+    if timings is not None:
+        logger.info('EolVimeo - Timings of {}:\n{}'.format(name, timings.format()))
+
+@task()
+def upload_video_vimeo_subtask(video, domain, course_id):
+    """
+        Upload one video of a process_data task, an exception is returned as
+        upload_failed so the callback of the chord always runs
+    """
+    try:
+        return upload_video_vimeo(video, domain, CourseKey.from_string(course_id))
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+        return {'edxVideoId': video.get('edxVideoId'), 'status': 'upload_failed', 'message': 'No se pudo subir el video a Vimeo. ', 'vimeo_id': ''}
+
+@task()
+def save_upload_vimeo_subtasks(response, videos, name_folder, domain, course_id, user_id, entry_id, succeeded=0, failed=0):
+    """
+        Callback of the chord of upload_video_vimeo_subtask: move the uploaded videos
+        to the folder, save their results and dispatch the next videos. After the
+        last videos the result is reported in the instructor task.
+    """
+    with upload_instrumentation('eol_vimeo_upload_{}'.format(save_upload_vimeo_subtasks.request.id)):
+        move_uploaded_videos(response, name_folder)
+        save_upload_vimeo(response, user_id, course_id)
+    failures = len([x for x in response if x['status'] == 'upload_failed'])
+    succeeded = succeeded + len(response) - failures
+    failed = failed + failures
+    if videos:
+        dispatch_upload_vimeo(videos, name_folder, domain, course_id, user_id, entry_id, succeeded, failed)
+    else:
+        report_upload_vimeo(entry_id, succeeded, failed)
+    return {'succeeded': succeeded, 'failed': failed}
+
+def dispatch_upload_vimeo(videos, name_folder, domain, course_id, user_id, entry_id, succeeded=0, failed=0):
+    """
+        Upload the first EOL_VIMEO_UPLOAD_CONCURRENCY videos in a chord of one subtask
+        per video, its callback dispatches the rest
+    """
+    concurrency = settings.EOL_VIMEO_UPLOAD_CONCURRENCY
+    header = [upload_video_vimeo_subtask.s(video, domain, course_id) for video in videos[:concurrency]]
+    callback = save_upload_vimeo_subtasks.s(videos[concurrency:], name_folder, domain, course_id, user_id, entry_id, succeeded, failed)
+    chord(header, callback).apply_async()
+
+def fan_out_upload_vimeo(data, name_folder, domain, course_id, user_id, entry_id):
+    """
+        Upload the videos in parallel with one celery subtask per video, at most
+        EOL_VIMEO_UPLOAD_CONCURRENCY at a time. Videos that are not uploaded are
+        saved immediately. Return the number of videos dispatched.
+    """
+    to_upload = [video for video in data if video.get('status') == 'upload_completed']
+    save_upload_vimeo([video for video in data if video.get('status') != 'upload_completed'], user_id, course_id)
+    if len(to_upload) == 0:
+        return 0
+    logger.info('EolVimeo - Uploading {} videos in subtasks, {} at a time, course: {}'.format(len(to_upload), settings.EOL_VIMEO_UPLOAD_CONCURRENCY, course_id))
+    dispatch_upload_vimeo(to_upload, name_folder, domain, str(course_id), user_id, entry_id)
+    return len(to_upload)
+
+def report_upload_vimeo(entry_id, succeeded, failed):
+    """
+        Save the result of the uploads of the subtasks in the instructor task
+    """
+    try:
+        entry = InstructorTask.objects.get(pk=entry_id)
+    except InstructorTask.DoesNotExist:
+        logger.info('EolVimeo - Instructor task does not exist, entry_id: {}'.format(entry_id))
+        return
+    entry.task_output = InstructorTask.create_output_for_success({
+        'action_name': 'generated',
+        'attempted': succeeded + failed,
+        'succeeded': succeeded,
+        'failed': failed,
+        'total': succeeded + failed,
+        'step': 'Uploaded Video to Vimeo',
+    })
+    entry.save_now()
+    logger.info('EolVimeo - Uploads of the instructor task {} finished, succeeded: {}, failed: {}'.format(entry_id, succeeded, failed))
+
 @task(base=BaseInstructorTask)
 def process_data(entry_id, xmodule_instance_args):
     action_name = ugettext_noop('generated')
@@ -87,9 +214,15 @@ def task_get_data(
     start_time = time()
     task_progress = TaskProgress(action_name, 1, start_time)
 
-    response = upload_vimeo(task_input['data'], task_input['name_folder'], task_input['domain'], course_id)
-    for video in response:
-        update_create_vimeo_model(video['edxVideoId'], user_id, video['status'], video['message'], str(course_id), vimeo_id=video['vimeo_id'])
+    with upload_instrumentation('eol_vimeo_upload_{}'.format(_entry_id)):
+        if settings.EOL_VIMEO_UPLOAD_CONCURRENCY > 0:
+            subtasks = fan_out_upload_vimeo(task_input['data'], task_input['name_folder'], task_input['domain'], course_id, user_id, _entry_id)
+            # the uploads continue in the subtasks, the last callback reports their result
+            current_step = {'step': 'Uploading Video to Vimeo in subtasks', 'subtasks': subtasks}
+            return task_progress.update_task_state(extra_meta=current_step)
+        else:
+            response = upload_vimeo(task_input['data'], task_input['name_folder'], task_input['domain'], course_id)
+            save_upload_vimeo(response, user_id, course_id)
     current_step = {'step': 'Uploading Video to Vimeo'}
     return task_progress.update_task_state(extra_meta=current_step)
 
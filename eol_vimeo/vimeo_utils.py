@@ -2,35 +2,99 @@
 # Python Standard Libraries
 from __future__ import unicode_literals
 import datetime
+import copy
+import hashlib
+import hmac
 import json
 import logging
+import os
+import socket
+import threading
 import urllib.parse
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 
 # Installed packages (via pip)
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import get_storage_class
+from django.db import transaction
+from django.db.models import F, Q
 from django.urls import reverse
 from django.utils import timezone
-import requests
 import vimeo
 
 # Edx dependencies
 from edxval.api import update_video_status, update_video, _get_video, get_video_info
+from edxval.models import CourseVideo, Video
 from lms.djangoapps.courseware.access import has_access
 from lms.djangoapps.courseware.courses import get_course_with_access
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 
 # Internal project dependencies
-from .models import EolVimeoVideo
+from . import vimeo_async, vimeo_metrics
+from .models import EolVimeoVideo, EolVimeoSyncState, PENDING_STATUS
+from .vimeo_client import get_client
 
 logger = logging.getLogger(__name__)
 
+VIMEO_BATCH_SIZE = 100
+POLL_FIELDS = ['status', 'error_description', 'url_vimeo']
+SCHEDULE_FIELDS = ['next_check_at', 'check_attempts']
+DUPLICATE_BATCH_SIZE = 500
+LEASE_BATCH_SIZE = 500
+_storage = {'pid': None, 'config': None, 'storage': None}
+_video_cache = {'pid': None, 'size': None, 'entries': OrderedDict()}
+_video_cache_lock = threading.Lock()
+# status, error_description, log of the decisions that only depend on the vimeo status
+STATUS_DECISIONS = {
+    'not_found': ('vimeo_not_found', 'No se pudo obtener el video en Vimeo.', 'EolVimeo - Video not found in vimeo, edx_video_id: {edx_video_id}'),
+    'upload_error': ('upload_failed', 'Video no se subió correctamente a Vimeo.', 'EolVimeo - video was not uploaded correctly, edx_video_id: {edx_video_id}, id_vimeo: {vimeo_video_id}'),
+    'uploading': ('vimeo_upload', 'Vimeo todavía está subiendo el video.', 'EolVimeo - Video is still uploading, edx_video_id: {edx_video_id}'),
+    'transcode_error': ('upload_failed', 'Video no fue procesado correctamente en Vimeo. ', 'EolVimeo - transcode video error, edx_video_id: {edx_video_id}, id_vimeo: {vimeo_video_id}'),
+    'transcoding': ('vimeo_encoding', 'Vimeo todavía está procesando el video.', 'EolVimeo - Video is still processing, edx_video_id: {edx_video_id}'),
+}
+# status, error_description, log of the transcoded videos by (link kind, age), age None is any age
+LINK_DECISIONS = {
+    ('original', None): ('vimeo_encoding', 'Vimeo todavía está procesando el video.', 'EolVimeo - Video is still processing, edx_video_id: {edx_video_id}'),
+    ('hd', None): ('upload_completed', 'upload_completed', None),
+    ('sd', 'recent'): ('vimeo_encoding', 'Vimeo todavía puede estar procesando el video.', None),
+    ('sd', 'late'): ('upload_completed_encoding', 'upload_completed_encoding, Lleva más de 2 hrs procesando.', None),
+    ('sd', 'stale'): ('upload_completed', 'upload_completed, Lleva mas de 24 hrs procesando o video no tiene formato HD', None),
+    ('none', 'recent'): ('vimeo_encoding', 'Vimeo todavía puede estar procesando el video.', None),
+    ('none', 'late'): ('vimeo_encoding', 'vimeo_encoding, Lleva más de 2 hrs procesando.', None),
+    ('none', 'stale'): ('upload_failed', 'upload_failed, Lleva mas de 24 hrs procesando o video no tiene formato HD', 'EolVimeo - Error vimeo upload, dont have HD format, edx_video_id: {edx_video_id}'),
+}
+# url_vimeo None keeps the link, edxval_status is sent with update_video_status
+# and edxval_video (link, size, name, duration, status) with update_edxval_url
+VideoDecision = namedtuple('VideoDecision', ['status', 'error_description', 'url_vimeo', 'edxval_status', 'edxval_video', 'log'])
+_storage_lock = threading.Lock()
+
 def get_storage():
     """
-        Get the default storage
+        Get the default storage, it is built once per process and
+        rebuilt if VIMEO_STORAGE_CLASS changes or the process was forked
+    """
+    config = settings.VIMEO_STORAGE_CLASS
+    pid = os.getpid()
+    if _storage['storage'] is None or _storage['pid'] != pid or _storage['config'] != config:
+        with _storage_lock:
+            if _storage['storage'] is None or _storage['pid'] != pid or _storage['config'] != config:
+                _storage['storage'] = get_storage_class(config['class'])(**config['options'])
+                _storage['pid'] = pid
+                _storage['config'] = copy.deepcopy(config)
+    return _storage['storage']
+
+def reset_storage():
+    """
+        Drop the storage, the next get_storage() builds it again
     """
-    return get_storage_class(settings.VIMEO_STORAGE_CLASS['class'])(**settings.VIMEO_STORAGE_CLASS['options'])
+    with _storage_lock:
+        _storage.update({'pid': None, 'config': None, 'storage': None})
 
 def check_credentials():
     """
@@ -42,12 +106,7 @@ def get_client_vimeo():
     if not check_credentials():
         logger.info('EolVimeo - Credentials are not defined')
         return None
-    client = vimeo.VimeoClient(
-        token=settings.EOL_VIMEO_CLIENT_TOKEN,
-        key=settings.EOL_VIMEO_CLIENT_ID,
-        secret=settings.EOL_VIMEO_CLIENT_SECRET
-    )
-    return client
+    return get_client()
 
 def is_course_staff(user, course_key):
     """
@@ -69,32 +128,55 @@ def is_instructor(user, course_key):
     except Exception:
         return False
 
+def get_course_access(user, course_key):
+    """
+        Load the course once and verify staff and instructor access together,
+        return (is_course_staff, is_instructor)
+    """
+    try:
+        course = get_course_with_access(user, "load", course_key)
+        return bool(has_access(user, 'staff', course)), bool(has_access(user, 'instructor', course))
+    except Exception:
+        return False, False
+
 def validate_user(user, course_id):
     """
-        Verify if the user have permission
+        Verify if the user have permission, the decision is cached by user id
+        and course for EOL_VIMEO_PERMISSION_CACHE_TIMEOUT seconds
     """
-    access = False
+    if user.is_anonymous:
+        return False
+    if user.is_staff:
+        return True
     course_key = CourseKey.from_string(course_id)
-    if not user.is_anonymous:
-        if user.is_staff:
-            access = True
-        if is_instructor(user, course_key):
-            access = True
-        if is_course_staff(user, course_key):
-            access = True
+    timeout = settings.EOL_VIMEO_PERMISSION_CACHE_TIMEOUT
+    cache_key = 'eol_vimeo_access_{}_{}'.format(user.id, course_key)
+    access = cache.get(cache_key) if timeout > 0 else None
+    if access is None:
+        access = any(get_course_access(user, course_key))
+        if timeout > 0:
+            cache.set(cache_key, access, timeout)
     return access
 
 def validate_course(id_curso):
     """
-        Verify if course.id exists
+        Verify if course.id exists, the existing courses are cached
+        for EOL_VIMEO_PERMISSION_CACHE_TIMEOUT seconds
     """
     from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
     try:
         aux = CourseKey.from_string(id_curso)
-        return CourseOverview.objects.filter(id=aux).exists()
     except InvalidKeyError:
         logger.error("EolVimeo - error validate course, invalid format: {}".format(id_curso))
         return False
+    timeout = settings.EOL_VIMEO_PERMISSION_CACHE_TIMEOUT
+    cache_key = 'eol_vimeo_course_{}'.format(aux)
+    if timeout > 0 and cache.get(cache_key):
+        return True
+    exists = CourseOverview.objects.filter(id=aux).exists()
+    if exists and timeout > 0:
+        cache.set(cache_key, True, timeout)
+    return exists
 
 def update_edxval_url(edx_video_id, video_url, file_size, file_name, duration, status):
     """
@@ -117,7 +199,9 @@ def update_edxval_url(edx_video_id, video_url, file_size, file_name, duration, s
         "status": status
     }
     try:
-        aux_id = update_video(data)
+        # savepoint, so an error does not break the transaction of the poller
+        with transaction.atomic():
+            aux_id = update_video(data)
         return True
     except Exception as e:
         logger.exception('EolVimeo - Error to update video path, id_video: {}, exception: {}'.format(edx_video_id, str(e)))
@@ -130,35 +214,151 @@ def add_domain_to_video(video_id):
     client = get_client_vimeo()
     if client is None:
         return False
-    domains = settings.EOL_VIMEO_DOMAINS
-    is_added = True
-    for domain in domains:
+    domains = list(settings.EOL_VIMEO_DOMAINS)
+    if settings.EOL_VIMEO_DOMAINS_SKIP_EXISTING and domains:
+        existing = get_video_domains(client, video_id)
+        domains = [x for x in domains if x not in existing]
+    if len(domains) <= 1:
+        return all([add_domain(client, video_id, domain) for domain in domains])
+    with ThreadPoolExecutor(max_workers=min(len(domains), settings.EOL_VIMEO_HTTP_POOL_SIZE)) as executor:
+        return all(list(executor.map(lambda domain: add_domain(client, video_id, domain), domains)))
+
+def add_domain(client, video_id, domain):
+    """
+        Add one domain to the whitelist of the video
+    """
+    try:
         response = client.put('/videos/{}/privacy/domains/{}'.format(video_id, domain))
-        if response.status_code == 204:
-            logger.info('EolVimeo - Domain {} added to video {} on vimeo'.format(domain, video_id))
-        else:
-            is_added = False
-            logger.info('EolVimeo - The domain "{}" was not added to the video {} on vimeo, response: {}'.format(domain, video_id, response.json()))
-    return is_added
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        logger.info('EolVimeo - Rate limit exceeded, the domain "{}" was not added to the video {} on vimeo'.format(domain, video_id))
+        return False
+    if response.status_code == 204:
+        logger.info('EolVimeo - Domain {} added to video {} on vimeo'.format(domain, video_id))
+        return True
+    logger.info('EolVimeo - The domain "{}" was not added to the video {} on vimeo, response: {}'.format(domain, video_id, response.json()))
+    return False
+
+def get_video_domains(client, video_id):
+    """
+        Get the whitelisted domains of the video with one request,
+        an empty set if they can not be obtained
+    """
+    try:
+        response = client.get('/videos/{}/privacy/domains'.format(video_id), params={'per_page': 100, 'fields': 'domain'})
+        if response.status_code == 200:
+            return set(x['domain'] for x in response.json()['data'])
+        logger.info('EolVimeo - Error to get the domains of the video {}, response: {}'.format(video_id, response.json()))
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        logger.info('EolVimeo - Rate limit exceeded, the domains of the video {} were not obtained'.format(video_id))
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+    return set()
 
 def get_video_vimeo(id_video):
     """
-        Get the video data from vimeo
+        Get the video data from vimeo. If the data of the video is cached with
+        its ETag/Last-Modified the request is conditional and a 304 returns the cached data.
     """
     client = get_client_vimeo()
     if client is None:
         return {}
     try:
-        response = client.get('/videos/{}'.format(id_video), params={"fields": "name,duration,files,upload,status,transcode"})
+        kwargs = {}
+        cached = get_cached_video(id_video)
+        if cached is not None:
+            kwargs['headers'] = {}
+            if cached['etag']:
+                kwargs['headers']['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                kwargs['headers']['If-Modified-Since'] = cached['last_modified']
+        response = client.get('/videos/{}'.format(id_video), params={"fields": "name,duration,files,upload,status,transcode"}, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            vimeo_metrics.increment('eol_vimeo_video_cache_total', result='not_modified')
+            return cached['data']
         if response.status_code == 200:
-            return response.json()
+            data = response.json()
+            set_cached_video(id_video, data, response)
+            return data
         else:
             logger.info('EolVimeo - The video does not exists, id_video_vimeo:{}, response: {}'.format(id_video, response.json()))
             return {}
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        raise
     except Exception as e:
         logger.exception('EolVimeo - Exception: %s' % str(e))
         return {}
 
+def get_video_cache():
+    """
+        Get the process-local LRU of the video data, it is rebuilt
+        if EOL_VIMEO_VIDEO_CACHE_SIZE changes or the process was forked
+    """
+    size = settings.EOL_VIMEO_VIDEO_CACHE_SIZE
+    pid = os.getpid()
+    if _video_cache['pid'] != pid or _video_cache['size'] != size:
+        with _video_cache_lock:
+            if _video_cache['pid'] != pid or _video_cache['size'] != size:
+                _video_cache.update({'pid': pid, 'size': size, 'entries': OrderedDict()})
+    return _video_cache['entries']
+
+def reset_video_cache():
+    """
+        Drop the cached video data of the process
+    """
+    with _video_cache_lock:
+        _video_cache.update({'pid': None, 'size': None, 'entries': OrderedDict()})
+
+def get_video_cache_key(id_video):
+    return 'eol_vimeo_video_{}'.format(id_video)
+
+def get_cached_video(id_video):
+    """
+        Get {'etag', 'last_modified', 'data'} of the video from the LRU,
+        then from the Django cache with EOL_VIMEO_VIDEO_CACHE_TIMEOUT, or None
+    """
+    if settings.EOL_VIMEO_VIDEO_CACHE_SIZE <= 0:
+        return None
+    entries = get_video_cache()
+    with _video_cache_lock:
+        cached = entries.get(id_video)
+        if cached is not None:
+            entries.move_to_end(id_video)
+            return cached
+    if settings.EOL_VIMEO_VIDEO_CACHE_TIMEOUT > 0:
+        cached = cache.get(get_video_cache_key(id_video))
+        if cached is not None:
+            set_lru_video(id_video, cached)
+    return cached
+
+def set_cached_video(id_video, data, response):
+    """
+        Cache the data of the video if the response has ETag or Last-Modified
+    """
+    if settings.EOL_VIMEO_VIDEO_CACHE_SIZE <= 0:
+        return
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+    except AttributeError:
+        return
+    etag = etag if isinstance(etag, str) and etag else None
+    last_modified = last_modified if isinstance(last_modified, str) and last_modified else None
+    if etag is None and last_modified is None:
+        return
+    cached = {'etag': etag, 'last_modified': last_modified, 'data': data}
+    set_lru_video(id_video, cached)
+    if settings.EOL_VIMEO_VIDEO_CACHE_TIMEOUT > 0:
+        cache.set(get_video_cache_key(id_video), cached, settings.EOL_VIMEO_VIDEO_CACHE_TIMEOUT)
+
+def set_lru_video(id_video, cached):
+    entries = get_video_cache()
+    with _video_cache_lock:
+        entries[id_video] = cached
+        entries.move_to_end(id_video)
+        while len(entries) > settings.EOL_VIMEO_VIDEO_CACHE_SIZE:
+            entries.popitem(last=False)
+
 def update_image(edx_video_id, course_key):
     """
         Update video picture from vimeo
@@ -191,7 +391,109 @@ def move_to_folder(id_video, id_folder):
     client = get_client_vimeo()
     if client is None:
         return False
-    return move_video(client, id_folder, id_video)
+    folder_id = get_folder_id(client, id_folder)
+    if folder_id is None:
+        return False
+    is_moved = move_video(client, folder_id, id_video)
+    if not is_moved:
+        forget_folder_id(id_folder)
+    return is_moved
+
+def move_videos_to_folder(ids_video, id_folder):
+    """
+        Move many videos to the folder (name or id) with one request per
+        VIMEO_BATCH_SIZE videos, return the list of ids moved
+    """
+    if id_folder is None:
+        logger.info('EolVimeo - Error to move videos, id_folder is None, ids_video: {}'.format(ids_video))
+        return []
+    client = get_client_vimeo()
+    if client is None:
+        return []
+    folder_id = get_folder_id(client, id_folder)
+    if folder_id is None:
+        return []
+    moved = []
+    for chunk in chunks(ids_video, VIMEO_BATCH_SIZE):
+        if len(chunk) == 1:
+            is_moved = move_video(client, folder_id, chunk[0])
+        else:
+            is_moved = move_videos(client, folder_id, chunk)
+        if is_moved:
+            moved.extend(chunk)
+    if len(moved) < len(ids_video):
+        forget_folder_id(id_folder)
+    return moved
+
+def move_videos(client, id_folder, ids_video):
+    """
+        Move ids_video to id_folder in one request
+    """
+    try:
+        response_folder = client.put('/me/projects/{}/videos'.format(id_folder), params={'uris': ','.join('/videos/{}'.format(x) for x in ids_video)})
+        if response_folder.status_code == 204:
+            return True
+        else:
+            logger.info('EolVimeo - Error to move videos, ids_video: {}, id_folder: {}, response: {}'.format(ids_video, id_folder, response_folder.json()))
+            return False
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+        return False
+
+def get_folder_id(client, name_folder):
+    """
+        Get the id of the folder, numeric names are used as id. Other names are
+        searched in the folders of the account (None if it does not exist)
+        and the id is cached for EOL_VIMEO_FOLDER_CACHE_TIMEOUT seconds.
+    """
+    name_folder = str(name_folder)
+    if name_folder.isdigit():
+        return name_folder
+    cache_key = get_folder_cache_key(name_folder)
+    folder_id = cache.get(cache_key)
+    if folder_id is not None:
+        return folder_id
+    try:
+        folder_id = find_folder(client, name_folder)
+        if folder_id is None:
+            logger.warning('EolVimeo - The folder "{}" does not exist in vimeo, check EOL_VIMEO_MAIN_FOLDER'.format(name_folder))
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+        return None
+    if folder_id is not None:
+        cache.set(cache_key, folder_id, settings.EOL_VIMEO_FOLDER_CACHE_TIMEOUT)
+    return folder_id
+
+def get_folder_cache_key(name_folder):
+    return 'eol_vimeo_folder_{}'.format(hashlib.sha256(str(name_folder).encode('utf-8')).hexdigest())
+
+def forget_folder_id(name_folder):
+    """
+        Drop the cached id of the folder (after a failed move, the folder may have been deleted)
+    """
+    if not str(name_folder).isdigit():
+        cache.delete(get_folder_cache_key(name_folder))
+
+def find_folder(client, name_folder, max_pages=10):
+    """
+        Search the folder by name in the folders of the account, return its id or None
+    """
+    url = '/me/projects'
+    params = {'per_page': 100, 'fields': 'uri,name'}
+    for page in range(max_pages):
+        response = client.get(url, params=params)
+        if response.status_code != 200:
+            logger.info('EolVimeo - Error to get the folders, response: {}'.format(response.json()))
+            return None
+        data = response.json()
+        for folder in data.get('data', []):
+            if folder.get('name') == name_folder:
+                return folder['uri'].split('/')[-1]
+        url = (data.get('paging') or {}).get('next')
+        params = None
+        if not url:
+            return None
+    return None
     
 def move_video(client, id_folder, id_video):
     """
@@ -214,19 +516,13 @@ def upload(id_file, domain, course_id):
     """
     video_vimeo = EolVimeoVideo.objects.get(edx_video_id=id_file, course_key=course_id)
     upload_url = '{}{}?videoid={}&token={}'.format(domain, reverse('vimeo_callback'), id_file, video_vimeo.token)
-    if not check_credentials():
-        logger.info('EolVimeo - Credentials are not defined')
+    client = get_client_vimeo()
+    if client is None:
         return 'Error'
     try:
         video = _get_video(id_file)
-        headers = {
-            "Authorization": "Bearer {}".format(settings.EOL_VIMEO_CLIENT_TOKEN),
-            "Content-Type": "application/json",
-            "Accept": 'application/vnd.vimeo.*+json;version=3.4'
-        }
         video_name = video.client_video_id.replace('.mp4', '')
         video_name = video_name.replace('.mov', '')
-        url = "https://api.vimeo.com/me/videos"
         body = {
             "upload": {
                 "approach": "pull",
@@ -239,7 +535,7 @@ def upload(id_file, domain, course_id):
                 'view': 'disable'
                 }
             }
-        r = requests.post(url, data=json.dumps(body), headers=headers)
+        r = client.post('/me/videos', data=body)
         if r.status_code == 201:
             data = json.loads(r.text)
             if data['upload']['status'] == 'in_progress':
@@ -296,7 +592,9 @@ def update_create_vimeo_model(edxVideoId, user_id, status, message, course_key_s
     """
     data = {
         'status':status,
-        'error_description':message
+        'error_description':message,
+        'next_check_at': None,
+        'check_attempts': 0
     }
     if url != '':
         data['url_vimeo'] = url
@@ -320,8 +618,8 @@ def duplicate_video(edx_val_id, old_course_key, new_course_key, user=None):
     """
         Duplicate a specific video in another course
     """
-    if EolVimeoVideo.objects.filter(edx_video_id=edx_val_id, course_key=old_course_key).exists() and not EolVimeoVideo.objects.filter(edx_video_id=edx_val_id, course_key=new_course_key).exists() :
-        vid_vimeo = EolVimeoVideo.objects.get(edx_video_id=edx_val_id, course_key=old_course_key)
+    vid_vimeo = EolVimeoVideo.objects.filter(edx_video_id=edx_val_id, course_key=old_course_key).first()
+    if vid_vimeo is not None and not EolVimeoVideo.objects.filter(edx_video_id=edx_val_id, course_key=new_course_key).exists():
         EolVimeoVideo.objects.create(
             edx_video_id = vid_vimeo.edx_video_id,
             user = user if user else vid_vimeo.user,
@@ -345,134 +643,606 @@ def duplicate_video(edx_val_id, old_course_key, new_course_key, user=None):
     else:
         logger.info('EOLVimeo - Error duplicate video, edx_video_id: {} with course: {} does not exist or already exists in course: {}'.format(edx_val_id, old_course_key, new_course_key))
 
-def duplicate_all_video(old_course_key, new_course_key, user=None):
+def duplicate_videos(edx_val_ids, old_course_key, new_course_key, user=None):
     """
-        Duplicate all video in another course
+        Duplicate many videos in another course, the source and target videos are
+        read with one query each, the copies are inserted with bulk_create and
+        added to the new course in edxval in one batch.
+        Return the list of edx_video_id duplicated.
     """
-    old_video_list = EolVimeoVideo.objects.filter(course_key=old_course_key)
-    old_video_ids = [x.edx_video_id for x in old_video_list]
-    new_video_list = EolVimeoVideo.objects.filter(edx_video_id__in=old_video_ids, course_key=new_course_key)
-    new_video_ids = [x.edx_video_id for x in new_video_list]
-    for video in old_video_list:
-        if video.edx_video_id not in new_video_ids:
-            EolVimeoVideo.objects.create(
+    edx_val_ids = list(dict.fromkeys(edx_val_ids))
+    sources = {x.edx_video_id: x for x in EolVimeoVideo.objects.filter(edx_video_id__in=edx_val_ids, course_key=old_course_key)}
+    targets = set(EolVimeoVideo.objects.filter(edx_video_id__in=edx_val_ids, course_key=new_course_key).values_list('edx_video_id', flat=True))
+    new_videos = [
+        EolVimeoVideo(
+            edx_video_id = sources[x].edx_video_id,
+            user_id = user.id if user else sources[x].user_id,
+            vimeo_video_id = sources[x].vimeo_video_id,
+            course_key = new_course_key,
+            url_vimeo = sources[x].url_vimeo,
+            status = sources[x].status,
+            error_description = sources[x].error_description
+        )
+        for x in edx_val_ids if x in sources and x not in targets
+    ]
+    for edx_val_id in edx_val_ids:
+        if edx_val_id not in sources or edx_val_id in targets:
+            logger.info('EOLVimeo - Error duplicate video, edx_video_id: {} with course: {} does not exist or already exists in course: {}'.format(edx_val_id, old_course_key, new_course_key))
+    if len(new_videos) == 0:
+        return []
+    EolVimeoVideo.objects.bulk_create(new_videos, ignore_conflicts=True)
+    duplicated = [x.edx_video_id for x in new_videos]
+    for edx_val_id in duplicated:
+        logger.info('EolVimeo - Duplicate video {} from {} to {}'.format(edx_val_id, old_course_key, new_course_key))
+    try:
+        linked = link_videos_to_course(duplicated, new_course_key)
+    except Exception as e:
+        logger.exception('EolVimeo - Error to update video path, id_video: {}, exception: {}'.format(duplicated, str(e)))
+        return duplicated
+    for edx_val_id in linked:
+        logger.info('EOLVimeo - Error duplicate video, edx_video_id: {} with course: {} already exists in edxval'.format(edx_val_id, new_course_key))
+    return duplicated
+
+def duplicate_all_video(old_course_key, new_course_key, user=None, link_edxval=False):
+    """
+        Duplicate all video in another course, the videos are streamed and
+        inserted with bulk_create in chunks of DUPLICATE_BATCH_SIZE,
+        videos already in the new course are skipped.
+        With link_edxval the videos are also added to the new course in edxval.
+    """
+    new_video_ids = set(EolVimeoVideo.objects.filter(course_key=new_course_key).values_list('edx_video_id', flat=True))
+    old_video_list = EolVimeoVideo.objects.filter(course_key=old_course_key).iterator(chunk_size=DUPLICATE_BATCH_SIZE)
+    for chunk in chunks(old_video_list, DUPLICATE_BATCH_SIZE):
+        new_videos = [
+            EolVimeoVideo(
                 edx_video_id = video.edx_video_id,
-                user = user if user else video.user,
+                user_id = user.id if user else video.user_id,
                 vimeo_video_id = video.vimeo_video_id,
                 course_key = new_course_key,
                 url_vimeo = video.url_vimeo,
                 status = video.status,
                 error_description = video.error_description
             )
+            for video in chunk if video.edx_video_id not in new_video_ids
+        ]
+        EolVimeoVideo.objects.bulk_create(new_videos, ignore_conflicts=True)
+        for video in new_videos:
             logger.info('EolVimeo - Duplicate video {} from {} to {}'.format(video.edx_video_id, old_course_key, new_course_key))
+        if link_edxval:
+            link_videos_to_course([x.edx_video_id for x in new_videos], new_course_key)
+
+def link_videos_to_course(edx_video_ids, course_key):
+    """
+        Add the videos to the course in edxval with three queries,
+        return the list of edx_video_id that were already in the course
+    """
+    videos = list(Video.objects.filter(edx_video_id__in=edx_video_ids).only('id', 'edx_video_id'))
+    linked = set(CourseVideo.objects.filter(course_id=str(course_key), video__in=videos).values_list('video__edx_video_id', flat=True))
+    CourseVideo.objects.bulk_create(
+        [CourseVideo(course_id=str(course_key), video=video) for video in videos if video.edx_video_id not in linked],
+        ignore_conflicts=True
+    )
+    return [x for x in edx_video_ids if x in linked]
 
-def update_video_vimeo(course_id=None):
+def get_videos_vimeo(ids_video):
     """
-        Update link and status of video with status ['vimeo_encoding', 'vimeo_upload']
+        Get the data of many videos (max VIMEO_BATCH_SIZE) from vimeo in one request,
+        return a dict {id_video: video_data} without the videos not found or None if the request failed
+    """
+    client = get_client_vimeo()
+    if client is None:
+        return None
+    try:
+        response = client.get('/me/videos', params={
+            "uris": ','.join('/videos/{}'.format(x) for x in ids_video),
+            "fields": "uri,name,duration,files,upload,status,transcode",
+            "per_page": VIMEO_BATCH_SIZE
+        })
+        if response.status_code == 200:
+            return {x['uri'].split('/')[-1]: x for x in response.json()['data']}
+        else:
+            logger.info('EolVimeo - Error to get videos, ids_video_vimeo: {}, response: {}'.format(ids_video, response.json()))
+            return None
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        raise
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+        return None
+
+def get_list_video_vimeo(ids_video):
+    """
+        Get the data of a list of videos from vimeo, one request per video.
+        The data is None for the videos not obtained because of the rate limit.
+    """
+    response = []
+    for id_video in ids_video:
+        try:
+            response.append(get_video_vimeo(id_video))
+        except vimeo.exceptions.APIRateLimitExceededFailure:
+            logger.info('EolVimeo - Rate limit exceeded, id_video_vimeo: {}'.format(id_video))
+            response.append(None)
+    return response
+
+def get_batch_video_vimeo(ids_video):
+    """
+        Get the data of a list of videos from vimeo with one request,
+        if the request fails the videos are requested one by one
+    """
+    ids = [x for x in ids_video if x]
+    try:
+        data = get_videos_vimeo(ids) if ids else {}
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        logger.info('EolVimeo - Rate limit exceeded, ids_video_vimeo: {}'.format(ids))
+        return [None for x in ids_video]
+    if data is None:
+        logger.info('EolVimeo - Batch request failed, getting the videos one by one')
+        return get_list_video_vimeo(ids_video)
+    return [data.get(x, {}) for x in ids_video]
+
+def chunks(iterable, size):
+    """
+        Split iterable in lists of length size
+    """
+    iterable = iter(iterable)
+    chunk = list(islice(iterable, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterable, size))
+
+def fetch_videos_vimeo(videos, workers=1, batch_size=None):
+    """
+        Yield (video, video_data) in the same order of videos.
+        With workers > 1 the data is fetched from vimeo in a thread pool,
+        only the requests run in the threads, the caller still processes one video at a time.
+        With batch_size the data of batch_size videos (max VIMEO_BATCH_SIZE) is fetched in one request.
+    """
+    if batch_size:
+        fetch = get_batch_video_vimeo
+        video_chunks = chunks(videos, min(batch_size, VIMEO_BATCH_SIZE))
+    else:
+        fetch = get_list_video_vimeo
+        video_chunks = chunks(videos, 1)
+    if workers <= 1:
+        for chunk in video_chunks:
+            yield from zip(chunk, fetch([x.vimeo_video_id for x in chunk]))
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for group in chunks(video_chunks, workers * 4):
+            results = executor.map(fetch, [[x.vimeo_video_id for x in chunk] for chunk in group])
+            for chunk, data in zip(group, results):
+                yield from zip(chunk, data)
+
+def schedule_video_vimeo(video, old_status, now):
+    """
+        Set when the pending video must be checked again, with exponential backoff
+        from EOL_VIMEO_POLL_BACKOFF[status] up to EOL_VIMEO_POLL_MAX_INTERVAL seconds.
+        The attempts restart when the status changes and videos uploaded more
+        than 24 hours ago are checked every EOL_VIMEO_POLL_MAX_INTERVAL seconds.
+    """
+    if video.status not in PENDING_STATUS:
+        video.next_check_at = None
+        video.check_attempts = 0
+        return
+    if video.status != old_status:
+        video.check_attempts = 0
+    delay = settings.EOL_VIMEO_POLL_BACKOFF.get(video.status, 60) * 2 ** min(video.check_attempts, 16)
+    if video.expiry_at is not None and now > video.expiry_at + datetime.timedelta(hours=24):
+        delay = settings.EOL_VIMEO_POLL_MAX_INTERVAL
+    video.check_attempts = video.check_attempts + 1
+    video.next_check_at = now + datetime.timedelta(seconds=min(delay, settings.EOL_VIMEO_POLL_MAX_INTERVAL))
+
+def save_videos_vimeo(videos):
+    """
+        Write POLL_FIELDS and SCHEDULE_FIELDS of the videos in one transaction
+    """
+    with transaction.atomic():
+        EolVimeoVideo.objects.bulk_update(videos, POLL_FIELDS + SCHEDULE_FIELDS)
+
+def get_pending_videos(now, course_id=None, status=None, due_only=True, shard=None, limit=None, older_than=None, newer_than=None):
+    """
+        Queryset of the pending videos to check.
+        status: list of statuses (a subset of PENDING_STATUS)
+        shard: (index, count), only the videos with id % count == index
+        older_than/newer_than: timedelta, age of the upload (by expiry_at)
+        limit: max videos, the most overdue first
+    """
+    videos = EolVimeoVideo.objects.filter(status__in=status or PENDING_STATUS)
+    if course_id is not None:
+        videos = videos.filter(course_key=CourseKey.from_string(course_id))
+    if due_only:
+        videos = videos.filter(Q(next_check_at__isnull=True) | Q(next_check_at__lte=now))
+    if shard is not None:
+        index, count = shard
+        videos = videos.annotate(eol_vimeo_shard=F('id') % count).filter(eol_vimeo_shard=index)
+    if older_than is not None:
+        videos = videos.filter(expiry_at__lte=now - older_than)
+    if newer_than is not None:
+        videos = videos.filter(expiry_at__gt=now - newer_than)
+    if limit is not None:
+        videos = order_by_overdue(videos)[:limit]
+    return videos
+
+def order_by_overdue(videos):
+    """
+        The most overdue videos first
+    """
+    return videos.order_by(F('next_check_at').asc(nulls_first=True), 'id')
+
+def update_video_vimeo(course_id=None, workers=1, batch_size=None, bulk_size=None, due_only=True, concurrency=None, **filters):
+    """
+        Update link and status of video with status ['vimeo_encoding', 'vimeo_upload'],
+        with due_only only the videos whose next_check_at has passed.
+        With concurrency the data is fetched with the async client (workers is ignored).
+        filters: status, shard, limit, older_than and newer_than of get_pending_videos
     """
     if check_credentials():
-        if course_id is None:
-            videos = EolVimeoVideo.objects.filter(status__in=['vimeo_encoding', 'vimeo_upload', 'upload_completed_encoding'])
+        now = timezone.now()
+        owner = None
+        if bulk_size is None:
+            bulk_size = settings.EOL_VIMEO_BULK_UPDATE_SIZE
+        if settings.EOL_VIMEO_POLL_LEASE_SECONDS > 0:
+            owner = get_lease_owner()
+            limit = filters.pop('limit', None)
+            videos = get_pending_videos(now, course_id=course_id, due_only=due_only, **filters)
+            if limit is not None:
+                videos = order_by_overdue(videos)
+            # each batch is claimed before its fetch, so the claim is only timed as scan
+            batches = claim_video_batches(videos, owner, limit)
         else:
-            course_key = CourseKey.from_string(course_id)
-            videos = EolVimeoVideo.objects.filter(course_key=course_key, status__in=['vimeo_encoding', 'vimeo_upload', 'upload_completed_encoding'])
-        for video in videos:
-            video_data = get_video_vimeo(video.vimeo_video_id)
-            if len(video_data) == 0:
-                logger.info('EolVimeo - Video not found in vimeo, edx_video_id: {}'.format(video.edx_video_id))
-                video.error_description = 'No se pudo obtener el video en Vimeo.'
-                video.status = 'vimeo_not_found'
-                video.save()
-                update_video_status(video.edx_video_id, 'vimeo_not_found')
-            elif video_data['status'] == 'uploading_error' or 'upload' not in video_data or video_data['upload']['status'] == 'error':
-                logger.info('EolVimeo - video was not uploaded correctly, edx_video_id: {}, id_vimeo: {}'.format(video.edx_video_id, video.vimeo_video_id))
-                video.status = 'upload_failed'
-                video.error_description = 'Video no se subió correctamente a Vimeo.'
-                video.save()
-                update_video_status(video.edx_video_id, 'upload_failed')
-            elif video_data['upload']['status'] == 'in_progress':
-                logger.info('EolVimeo - Video is still uploading, edx_video_id: {}'.format(video.edx_video_id))
-                video.status = 'vimeo_upload'
-                video.error_description = 'Vimeo todavía está subiendo el video.'
-                video.save()
-                update_video_status(video.edx_video_id, 'vimeo_upload')
-            elif 'files' not in video_data or len(video_data['files']) == 0:
-                video.error_description = 'No se pudo obtener los links del video en Vimeo. '
-                video.save()
-            else:
-                if video_data['status'] in ['transcoding', 'available', 'transcode_starting', 'uploading']:
-                    if 'transcode' not in video_data or len(video_data['transcode']) == 0 or video_data['transcode']['status'] == 'error':
-                        logger.info('EolVimeo - transcode video error, edx_video_id: {}, id_vimeo: {}'.format(video.edx_video_id, video.vimeo_video_id))
-                        video.status = 'upload_failed'
-                        video.error_description = 'Video no fue procesado correctamente en Vimeo. '
-                        video.save()
-                        update_video_status(video.edx_video_id, 'upload_failed')
-                    elif video_data['transcode']['status'] == 'in_progress':
-                        logger.info('EolVimeo - Video is still processing, edx_video_id: {}'.format(video.edx_video_id))
-                        video.status = 'vimeo_encoding'
-                        video.error_description = 'Vimeo todavía está procesando el video.'
-                        video.save()
-                        update_video_status(video.edx_video_id, 'vimeo_encoding')
-                    else:
-                        quality_video = get_link_video(video_data)
-                        now = timezone.now()
-                        video_name = video_data['name'].replace('{}_'.format(str(video.course_key)), '')
-                        if quality_video is not None:
-                            if quality_video['public_name'] == 'Original':
-                                logger.info('EolVimeo - Video is still processing, edx_video_id: {}'.format(video.edx_video_id))
-                                error_description = 'Vimeo todavía está procesando el video.'
-                                status_video = 'vimeo_encoding'
-                            else:
-                                if quality_video['quality'] == "hd":
-                                    status_video = 'upload_completed'
-                                    error_description = 'upload_completed'
-                                else:
-                                    now = timezone.now()
-                                    if now > (video.expiry_at + datetime.timedelta(hours=2)):
-                                        if now > (video.expiry_at + datetime.timedelta(hours=24)):
-                                            status_video = 'upload_completed'
-                                            error_description = 'upload_completed, Lleva mas de 24 hrs procesando o video no tiene formato HD'
-                                        else:
-                                            status_video = 'upload_completed_encoding'
-                                            error_description = 'upload_completed_encoding, Lleva más de 2 hrs procesando.'
-                                    else:
-                                        status_video = 'vimeo_encoding'
-                                        error_description = 'Vimeo todavía puede estar procesando el video.'
-                            video.url_vimeo = quality_video['link']
-                            video.status = status_video
-                            video.error_description = error_description
-                            video.save()
-                            is_updated = update_edxval_url(video.edx_video_id, quality_video['link'], quality_video['size'], video_name, video_data['duration'], status_video)
-                            if is_updated:
-                                logger.info('EolVimeo - Video updated completed, edx_video_id: {}'.format(video.edx_video_id))
-                                get_storage().delete(video.edx_video_id)
-                            else:
-                                logger.info('EolVimeo - error update_video in edxval.api, edx_video_id: {}'.format(video.edx_video_id))
-                                video.error_description = 'No se pudo agregar el path vimeo del video al video en plataforma(error update_video in edxval.api). '
-                                video.status = 'vimeo_patch_failed'
-                                video.save()
-                                update_video_status(video.edx_video_id, 'vimeo_patch_failed')
-                        else:
-                            if now > (video.expiry_at + datetime.timedelta(hours=2)):
-                                if now > (video.expiry_at + datetime.timedelta(hours=24)):
-                                    logger.info('EolVimeo - Error vimeo upload, dont have HD format, edx_video_id: {}'.format(video.edx_video_id))
-                                    status_video = 'upload_failed'
-                                    error_description = 'upload_failed, Lleva mas de 24 hrs procesando o video no tiene formato HD'
-                                else:
-                                    status_video = 'vimeo_encoding'
-                                    error_description = 'vimeo_encoding, Lleva más de 2 hrs procesando.'
-                            else:
-                                status_video = 'vimeo_encoding'
-                                error_description = 'Vimeo todavía puede estar procesando el video.'
-                            video.status = status_video
-                            video.error_description = error_description
-                            video.save()
-                            update_video_status(video.edx_video_id, status_video)
-                else:
-                    logger.info('EolVimeo - video was not uploaded correctly, edx_video_id: {}, id_vimeo: {}'.format(video.edx_video_id, video.vimeo_video_id))
-                    video.status = 'upload_failed'
-                    video.error_description = 'Video no se subió correctamente a Vimeo.status={}'.format(video_data['status'])
-                    video.save()
-                    update_video_status(video.edx_video_id, 'upload_failed')
+            videos = get_pending_videos(now, course_id=course_id, due_only=due_only, **filters)
+            with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='scan'):
+                batches = [list(videos)]
+        try:
+            for batch in batches:
+                process_videos_vimeo(batch, now, workers, batch_size, bulk_size, concurrency)
+        finally:
+            if owner is not None:
+                release_videos(owner)
     else:
         logger.info('EolVimeo - Credentials are not defined')
+
+def process_videos_vimeo(videos, now, workers, batch_size, bulk_size, concurrency):
+    """
+        Fetch the data of the videos from vimeo, classify them and save them in batches of bulk_size
+    """
+    decisions = []
+    if concurrency:
+        fetched = vimeo_async.fetch_videos_vimeo(videos, concurrency, batch_size)
+    else:
+        fetched = fetch_videos_vimeo(videos, workers, batch_size)
+    for video, video_data in vimeo_metrics.timed(fetched, 'eol_vimeo_poll_phase_seconds', phase='fetch'):
+        if video_data is None:
+            logger.info('EolVimeo - Video skipped by the rate limit, it will be updated in the next run, edx_video_id: {}'.format(video.edx_video_id))
+            vimeo_metrics.increment('eol_vimeo_poll_videos_total', status='rate_limited')
+            continue
+        decisions.append((video, classify_video_vimeo(video, video_data, timezone.now())))
+        if len(decisions) >= max(bulk_size, 1):
+            apply_decisions_vimeo(decisions, now, bulk_size > 1)
+            decisions = []
+    if decisions:
+        apply_decisions_vimeo(decisions, now, bulk_size > 1)
+
+def get_lease_owner():
+    """
+        Unique owner of the leases of a poller run
+    """
+    return '{}:{}:{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)[-100:]
+
+def claim_videos(videos, owner, limit=None, batch_size=LEASE_BATCH_SIZE):
+    """
+        Yield the videos of the queryset claimed by owner, see claim_video_batches
+    """
+    for batch in claim_video_batches(videos, owner, limit, batch_size):
+        yield from batch
+
+def claim_video_batches(videos, owner, limit=None, batch_size=LEASE_BATCH_SIZE):
+    """
+        Yield lists of the videos of the queryset claimed by owner, LEASE_BATCH_SIZE at a time.
+        A batch is claimed with a conditional UPDATE of the rows without an active lease,
+        so concurrent pollers get disjoint rows. The leases are kept until release_videos
+        (or EOL_VIMEO_POLL_LEASE_SECONDS), the rows seen in the run are excluded so a row
+        is not claimed twice even if its lease expired.
+    """
+    if not videos.ordered:
+        videos = videos.order_by('id')
+    claimed = 0
+    seen = set()
+    while limit is None or claimed < limit:
+        with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='scan'):
+            now = timezone.now()
+            free = Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+            size = batch_size if limit is None else min(batch_size, limit - claimed)
+            ids = list(videos.filter(free).exclude(id__in=seen).values_list('id', flat=True)[:size])
+            if len(ids) == 0:
+                return
+            seen.update(ids)
+            expires_at = now + datetime.timedelta(seconds=settings.EOL_VIMEO_POLL_LEASE_SECONDS)
+            EolVimeoVideo.objects.filter(free, id__in=ids).update(lease_owner=owner, lease_expires_at=expires_at)
+            batch = list(EolVimeoVideo.objects.filter(id__in=ids, lease_owner=owner, lease_expires_at=expires_at).order_by('id'))
+        if len(batch) < len(ids):
+            logger.info('EolVimeo - {} videos were claimed by other poller'.format(len(ids) - len(batch)))
+        claimed = claimed + len(batch)
+        if batch:
+            yield batch
+
+def release_videos(owner):
+    """
+        Release the leases of owner, return the number of videos released
+    """
+    return EolVimeoVideo.objects.filter(lease_owner=owner).update(lease_owner='', lease_expires_at=None)
+
+def apply_decisions_vimeo(decisions, now, bulk=True):
+    """
+        Apply a list of (video, decision), schedule the next check of the videos
+        and save them. The changes in edxval and the model are in one transaction
+        per batch with bulk (per video without bulk), the files are deleted from
+        the storage after the commit.
+    """
+    if bulk:
+        with transaction.atomic():
+            for video, decision in decisions:
+                schedule_decision_vimeo(video, decision, now)
+            with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='save'):
+                save_videos_vimeo([video for video, decision in decisions])
+    else:
+        for video, decision in decisions:
+            with transaction.atomic():
+                schedule_decision_vimeo(video, decision, now)
+                with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='save'):
+                    video.save(update_fields=POLL_FIELDS + SCHEDULE_FIELDS)
+
+def schedule_decision_vimeo(video, decision, now):
+    """
+        Apply the decision to the video and schedule its next check, the video is not saved
+    """
+    status = video.status
+    with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='apply'):
+        apply_decision_vimeo(video, decision)
+    schedule_video_vimeo(video, status, now)
+    vimeo_metrics.increment('eol_vimeo_poll_videos_total', status=video.status)
+
+def update_video_vimeo_by_id(vimeo_video_id):
+    """
+        Update link and status of the pending videos with vimeo_video_id,
+        return the number of videos checked. The videos are left to the poller
+        if the data of the video can not be obtained.
+    """
+    if not check_credentials():
+        logger.info('EolVimeo - Credentials are not defined')
+        return 0
+    videos = EolVimeoVideo.objects.filter(vimeo_video_id=vimeo_video_id, status__in=PENDING_STATUS).order_by('id')
+    owner = get_lease_owner() if settings.EOL_VIMEO_POLL_LEASE_SECONDS > 0 else None
+    try:
+        # the videos leased by a running poller are left to it
+        videos = list(claim_videos(videos, owner) if owner is not None else videos)
+        if len(videos) == 0:
+            return 0
+        video_data = get_video_vimeo(vimeo_video_id)
+        if not video_data:
+            logger.info('EolVimeo - Webhook could not get the video, it will be updated by the poller, id_vimeo: {}'.format(vimeo_video_id))
+            return 0
+        now = timezone.now()
+        for video in videos:
+            status = video.status
+            process_video_vimeo(video, video_data)
+            schedule_video_vimeo(video, status, now)
+            video.save(update_fields=POLL_FIELDS + SCHEDULE_FIELDS)
+        return len(videos)
+    finally:
+        if owner is not None:
+            release_videos(owner)
+
+def sync_video_vimeo(bulk_size=None, max_pages=None):
+    """
+        Incremental sync: page through the videos of the account sorted by modified_time
+        (newest first) until the stored high-water mark, and update only the pending videos
+        modified since the last run. Return the number of videos checked.
+        The mark is only moved forward when all the pages since it were read.
+        The due videos uploaded more than 2 hrs ago are polled too, their age
+        transitions (late, stale) do not modify the video in vimeo.
+    """
+    if not check_credentials():
+        logger.info('EolVimeo - Credentials are not defined')
+        return 0
+    if bulk_size is None:
+        bulk_size = settings.EOL_VIMEO_BULK_UPDATE_SIZE
+    if max_pages is None:
+        max_pages = settings.EOL_VIMEO_SYNC_MAX_PAGES
+    state, created = EolVimeoSyncState.objects.get_or_create(name='modified_time')
+    mark = state.high_water_mark
+    if mark is None:
+        # first run, no pending video can be modified before its upload
+        oldest = EolVimeoVideo.objects.filter(status__in=PENDING_STATUS, expiry_at__isnull=False).order_by('expiry_at').values_list('expiry_at', flat=True).first()
+        mark = (oldest or timezone.now()) - datetime.timedelta(hours=1)
+    modified, newest, complete = get_modified_videos_vimeo(mark, max_pages)
+    count = 0
+    now = timezone.now()
+    owner = get_lease_owner() if settings.EOL_VIMEO_POLL_LEASE_SECONDS > 0 else None
+    try:
+        for chunk in chunks(list(modified), LEASE_BATCH_SIZE):
+            videos = EolVimeoVideo.objects.filter(vimeo_video_id__in=chunk, status__in=PENDING_STATUS).order_by('id')
+            if owner is not None:
+                videos = claim_videos(videos, owner)
+            decisions = [(video, classify_video_vimeo(video, modified[video.vimeo_video_id], now)) for video in videos]
+            for batch in chunks(decisions, max(bulk_size, 1)):
+                apply_decisions_vimeo(batch, now, bulk_size > 1)
+            count = count + len(decisions)
+    finally:
+        if owner is not None:
+            release_videos(owner)
+    if complete:
+        state.high_water_mark = max(mark, newest) if newest else mark
+        state.save()
+    else:
+        logger.info('EolVimeo - Sync stopped before the high-water mark {}, it is not moved'.format(mark))
+    logger.info('EolVimeo - Sync checked {} videos, {} modified in vimeo'.format(count, len(modified)))
+    update_video_vimeo(bulk_size=bulk_size, older_than=datetime.timedelta(hours=2))
+    return count
+
+def get_modified_videos_vimeo(mark, max_pages):
+    """
+        Get the videos of the account modified at or after mark,
+        return ({id_video: video_data}, newest modified_time, True if all the pages were read)
+    """
+    client = get_client_vimeo()
+    modified = {}
+    newest = None
+    url = '/me/videos'
+    params = {
+        'sort': 'modified_time',
+        'direction': 'desc',
+        'per_page': VIMEO_BATCH_SIZE,
+        'fields': 'uri,modified_time,name,duration,files,upload,status,transcode'
+    }
+    try:
+        for page in range(max_pages):
+            response = client.get(url, params=params)
+            if response.status_code != 200:
+                logger.info('EolVimeo - Error to get the modified videos, response: {}'.format(response.json()))
+                return modified, newest, False
+            data = response.json()
+            for video_data in data['data']:
+                modified_time = datetime.datetime.fromisoformat(video_data['modified_time'].replace('Z', '+00:00'))
+                if modified_time < mark:
+                    return modified, newest, True
+                newest = max(newest, modified_time) if newest else modified_time
+                modified[video_data['uri'].split('/')[-1]] = video_data
+            url = (data.get('paging') or {}).get('next')
+            params = None
+            if not url:
+                return modified, newest, True
+    except vimeo.exceptions.APIRateLimitExceededFailure:
+        logger.info('EolVimeo - Rate limit exceeded, the sync will continue in the next run')
+        return modified, newest, False
+    except Exception as e:
+        logger.exception('EolVimeo - Exception: %s' % str(e))
+        return modified, newest, False
+    return modified, newest, False
+
+def sign_webhook(body):
+    """
+        Signature of a webhook body with EOL_VIMEO_WEBHOOK_SECRET
+    """
+    return 'sha256={}'.format(hmac.new(settings.EOL_VIMEO_WEBHOOK_SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest())
+
+def check_webhook_signature(body, signature):
+    """
+        Verify the signature of a webhook body
+    """
+    if settings.EOL_VIMEO_WEBHOOK_SECRET == '':
+        return False
+    return hmac.compare_digest(sign_webhook(body), signature)
+
+def get_webhook_video_id(payload):
+    """
+        Get the vimeo id of the video of a webhook event,
+        the uri can be in 'uri', 'video.uri', 'clip.uri' or 'data.uri'
+    """
+    uri = payload.get('uri')
+    for key in ['video', 'clip', 'data']:
+        if uri is None and isinstance(payload.get(key), dict):
+            uri = payload[key].get('uri')
+    if not isinstance(uri, str) or not uri.startswith('/videos/'):
+        return None
+    return uri.split('/')[2] or None
+
+def get_video_age(video, now):
+    """
+        Age bucket of the upload: 'recent' (up to 2 hrs after expiry_at), 'late' (up to 24 hrs) or 'stale'
+    """
+    if video.expiry_at is None or now <= video.expiry_at + datetime.timedelta(hours=2):
+        return 'recent'
+    if now <= video.expiry_at + datetime.timedelta(hours=24):
+        return 'late'
+    return 'stale'
+
+def get_link_kind(quality_video):
+    """
+        Kind of the chosen link: 'none', 'original' (not transcoded yet), 'hd' or 'sd'
+    """
+    if quality_video is None:
+        return 'none'
+    if quality_video['public_name'] == 'Original':
+        return 'original'
+    if quality_video['quality'] == 'hd':
+        return 'hd'
+    return 'sd'
+
+def classify_video_vimeo(video, video_data, now):
+    """
+        Decide the new state of the video with the data obtained from vimeo.
+        It has no side effects (video is only read), the decision is applied with apply_decision_vimeo.
+    """
+    if len(video_data) == 0:
+        return make_decision(*STATUS_DECISIONS['not_found'])
+    if video_data['status'] == 'uploading_error' or 'upload' not in video_data or video_data['upload']['status'] == 'error':
+        return make_decision(*STATUS_DECISIONS['upload_error'])
+    if video_data['upload']['status'] == 'in_progress':
+        return make_decision(*STATUS_DECISIONS['uploading'])
+    if 'files' not in video_data or len(video_data['files']) == 0:
+        return VideoDecision(video.status, 'No se pudo obtener los links del video en Vimeo. ', None, None, None, None)
+    if video_data['status'] not in ['transcoding', 'available', 'transcode_starting', 'uploading']:
+        status, error_description, log = STATUS_DECISIONS['upload_error']
+        return make_decision(status, '{}status={}'.format(error_description, video_data['status']), log)
+    if 'transcode' not in video_data or len(video_data['transcode']) == 0 or video_data['transcode']['status'] == 'error':
+        return make_decision(*STATUS_DECISIONS['transcode_error'])
+    if video_data['transcode']['status'] == 'in_progress':
+        return make_decision(*STATUS_DECISIONS['transcoding'])
+    quality_video = get_link_video(video_data)
+    kind = get_link_kind(quality_video)
+    decision = LINK_DECISIONS.get((kind, None)) or LINK_DECISIONS[(kind, get_video_age(video, now))]
+    if quality_video is None:
+        return make_decision(*decision)
+    status, error_description, log = decision
+    video_name = video_data['name'].replace('{}_'.format(str(video.course_key)), '')
+    edxval_video = (quality_video['link'], quality_video['size'], video_name, video_data['duration'], status)
+    return VideoDecision(status, error_description, quality_video['link'], None, edxval_video, log)
+
+def make_decision(status, error_description, log):
+    """
+        Decision that only updates the status in the model and in edxval
+    """
+    return VideoDecision(status, error_description, None, status, None, log)
+
+def apply_decision_vimeo(video, decision):
+    """
+        Apply a decision of classify_video_vimeo to the video, edxval and the storage.
+        The video is not saved.
+    """
+    if decision.log is not None:
+        logger.info(decision.log.format(edx_video_id=video.edx_video_id, vimeo_video_id=video.vimeo_video_id))
+    video.status = decision.status
+    video.error_description = decision.error_description
+    if decision.url_vimeo is not None:
+        video.url_vimeo = decision.url_vimeo
+    if decision.edxval_status is not None:
+        with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='update_video_status'):
+            update_video_status(video.edx_video_id, decision.edxval_status)
+    if decision.edxval_video is not None:
+        with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='update_edxval_url'):
+            is_updated = update_edxval_url(video.edx_video_id, *decision.edxval_video)
+        if is_updated:
+            logger.info('EolVimeo - Video updated completed, edx_video_id: {}'.format(video.edx_video_id))
+            transaction.on_commit(partial(delete_video_file, video.edx_video_id))
+        else:
+            logger.info('EolVimeo - error update_video in edxval.api, edx_video_id: {}'.format(video.edx_video_id))
+            video.error_description = 'No se pudo agregar el path vimeo del video al video en plataforma(error update_video in edxval.api). '
+            video.status = 'vimeo_patch_failed'
+            with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='update_video_status'):
+                update_video_status(video.edx_video_id, 'vimeo_patch_failed')
+
+def delete_video_file(edx_video_id):
+    """
+        Delete the uploaded file of the video from the storage
+    """
+    with vimeo_metrics.timer('eol_vimeo_poll_phase_seconds', phase='storage_delete'):
+        get_storage().delete(edx_video_id)
+
+def process_video_vimeo(video, video_data, now=None):
+    """
+        Update link and status of the video with the data obtained from vimeo.
+        The video is not saved, return True if any of POLL_FIELDS changed.
+    """
+    before = [getattr(video, x) for x in POLL_FIELDS]
+    apply_decision_vimeo(video, classify_video_vimeo(video, video_data, now or timezone.now()))
+    return before != [getattr(video, x) for x in POLL_FIELDS]
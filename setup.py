@@ -26,6 +26,9 @@ setup(
     install_requires=[
         "PyVimeo>=1.1.0"
         ],
+    extras_require={
+        "async": ["httpx[http2]"]
+        },
     classifiers=[
         "Programming Language :: Python :: 2",
         "License :: OSI Approved :: MIT License",